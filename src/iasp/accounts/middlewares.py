@@ -1,28 +1,70 @@
+from django.conf import settings
 from django.contrib import messages
 from django.shortcuts import redirect
-from django.urls import resolve, reverse
+from django.urls import URLResolver, get_resolver
+from django.urls.resolvers import RoutePattern
 from django.utils.translation import gettext_lazy as _
 
 from . settings import *
 
 
+def _static_route_prefix(pattern):
+    """
+    Static part of a path() route, until the first converter
+    """
+    if not isinstance(pattern, RoutePattern): return ''
+    return str(pattern).split('<', 1)[0]
+
+
+def get_safe_url_prefixes():
+    """
+    Path prefixes of SAFE_URL_APPS urls, plus static and media,
+    computed once walking the root urlconf
+    """
+    prefixes = set()
+    for url_pattern in get_resolver().url_patterns:
+        if not isinstance(url_pattern, URLResolver): continue
+        if url_pattern.namespace not in SAFE_URL_APPS: continue
+        base = _static_route_prefix(url_pattern.pattern)
+        if base:
+            prefixes.add(f'/{base}')
+            continue
+        # app included without prefix, use its routes
+        for app_pattern in url_pattern.url_patterns:
+            route = _static_route_prefix(app_pattern.pattern)
+            if route: prefixes.add(f'/{route}')
+    for url in (settings.STATIC_URL, settings.MEDIA_URL):
+        if url and url.startswith('/') and url != '/':
+            prefixes.add(url)
+    return tuple(sorted(prefixes))
+
+
 class AccountsChangeDataMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.safe_url_paths = frozenset(SAFE_URL_PATHS)
+        self.safe_url_prefixes = None
+
+    def is_safe_path(self, request):
+        if request.path in self.safe_url_paths:
+            return True
+        # lazy, urlconf could be not loaded at startup
+        if self.safe_url_prefixes is None:
+            self.safe_url_prefixes = get_safe_url_prefixes()
+        return request.path_info.startswith(self.safe_url_prefixes)
 
     def __call__(self, request):
         user = request.user
 
-        path_app_name = resolve(request.path).app_name
-        safe_path = request.path in SAFE_URL_PATHS or path_app_name in SAFE_URL_APPS
-
-        if user.is_authenticated and not safe_path:
+        if user.is_authenticated and not request.session.get(PROFILE_COMPLETE_SESSION_KEY) and not self.is_safe_path(request):
             for field in REQUIRED_FIELDS:
                 if not getattr(user, field):
                     messages.add_message(
                         request, messages.INFO, _("Completa il tuo profilo per poter utilizzare il sistema")
                     )
                     return redirect("accounts:change_data")
+            # cleared when user data change
+            request.session[PROFILE_COMPLETE_SESSION_KEY] = True
 
         # Retrieving the response
         response = self.get_response(request)
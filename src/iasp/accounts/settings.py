@@ -10,6 +10,7 @@ CHANGE_EMAIL_TOKEN_LIFE = getattr(settings, 'CHANGE_EMAIL_TOKEN_LIFE', 30) # min
 
 SAFE_URL_PATHS = getattr(settings, 'SAFE_URL_PATHS', [])
 SAFE_URL_APPS = getattr(settings, 'SAFE_URL_APPS', ['admin', 'accounts'])
+PROFILE_COMPLETE_SESSION_KEY = 'accounts_profile_complete'
 
 JWE_RSA_KEY_PATH = getattr(
     settings, "JWE_RSA_KEY_PATH", "certs/private.key"
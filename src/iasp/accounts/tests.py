@@ -1,2 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from . settings import PROFILE_COMPLETE_SESSION_KEY
+
+
+class AccountsChangeDataMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='user',
+            taxpayer_id='USER'
+        )
+        self.client.force_login(self.user)
+        self.url = reverse('calls:calls')
+
+    def test_incomplete_profile_redirect(self):
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('accounts:change_data'), fetch_redirect_response=False)
+        self.assertNotIn(PROFILE_COMPLETE_SESSION_KEY, self.client.session)
+
+    def test_safe_urls_not_redirected(self):
+        response = self.client.get(reverse('accounts:account'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_complete_profile_session_flag(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(email='user@example.org')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.client.session[PROFILE_COMPLETE_SESSION_KEY])
+
+        # profile is not checked again in the session
+        get_user_model().objects.filter(pk=self.user.pk).update(email='')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        # until the flag is cleared, as on user data changes
+        session = self.client.session
+        session.pop(PROFILE_COMPLETE_SESSION_KEY)
+        session.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, reverse('accounts:change_data'), fetch_redirect_response=False)
@@ -43,6 +43,7 @@ def changeData(request):
                 user = form.save(commit=False)
                 user.manual_user_update = timezone.now()
                 user.save()
+                request.session.pop(PROFILE_COMPLETE_SESSION_KEY, None)
                 messages.add_message(
                     request, messages.SUCCESS, _("Data saved successfully")
                 )
@@ -115,6 +116,7 @@ def confirmEmail(request):
     user.email = email
     user.manual_user_update = timezone.now()
     user.save(update_fields=['email', 'manual_user_update'])
+    request.session.pop(PROFILE_COMPLETE_SESSION_KEY, None)
     messages.add_message(
         request, messages.SUCCESS, _("Email updated successfully")
     )
@@ -2,19 +2,29 @@ from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.translation import gettext_lazy as _
 
-from calls.models import CallExcludedActivity
+from calls.models import CALL_DEFERRED_FIELDS
+
+from generics.utils import get_request_objects
 
 from . models import Application
+from . utils import get_excluded_codes
 
 
 def application_check(func_to_decorate):
     def new_func(*original_args, **original_kwargs):
         request = original_args[0]
-        application = get_object_or_404(
-            Application,
-            pk=original_kwargs['application_pk'],
-            user=request.user
-        )
+        objects = get_request_objects(request)
+        application = objects.application
+        if not application or application.pk != original_kwargs['application_pk']:
+            application = get_object_or_404(
+                Application.objects.select_related('call').defer(
+                    *[f'call__{field}' for field in CALL_DEFERRED_FIELDS]
+                ),
+                pk=original_kwargs['application_pk'],
+                user=request.user
+            )
+            objects.application = application
+            objects.call = application.call
         original_kwargs['application'] = application
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -58,12 +68,7 @@ def activity_check(func_to_decorate):
                 application_pk=application.pk
             )
 
-        codes_to_exclude = CallExcludedActivity.objects.filter(
-            call=application.call,
-            is_active=True
-        ).values_list('code', flat=True)
-
-        if target_teaching['cod'] in codes_to_exclude:
+        if target_teaching['cod'] in get_excluded_codes(request, application.call):
             messages.add_message(
                 request,
                 messages.ERROR,
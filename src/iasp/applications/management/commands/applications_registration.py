@@ -1,7 +1,11 @@
+import django
 import logging
 import time
 
+from concurrent.futures import ProcessPoolExecutor
+
 from django.core.management.base import BaseCommand
+from django.db import connections
 from django.utils import timezone
 
 from calls.models import CallTitulusConfiguration
@@ -19,6 +23,14 @@ logger = logging.getLogger(__name__)
 
 
 
+def generate_docs(application_pk):
+    """
+    Process pool worker, generates the merged docs of an application
+    """
+    application = Application.objects.get(pk=application_pk)
+    return generate_application_merged_docs(application)
+
+
 def confirm():
     """
     Ask user to enter Y or N (case-insensitive).
@@ -38,6 +50,8 @@ class Command(BaseCommand):
         parser.epilog = 'Example: ./manage.py applications_registration'
         parser.add_argument('-y', required=False, action="store_true",
                             help="send all ready messages")
+        parser.add_argument('--workers', type=int, required=False, default=1,
+                            help="processes generating the applications documents ahead of registration")
 
     def handle(self, *args, **options):
         if options['y'] or confirm():
@@ -48,77 +62,100 @@ class Command(BaseCommand):
                 protocol_date__isnull=True,
                 protocol_taken__isnull=True
             )
-            for index, application in enumerate(applications):
-
-                if index: time.sleep(REGISTRATION_JOB_SLEEP_TIME)
-
-                application.refresh_from_db()
-                if application.protocol_taken: continue
-
-                print(f'[{application}] - Registering application {application.pk} - {application.call.title_it}')
-
-                application.protocol_taken = timezone.localtime()
-                application.save(update_fields=['protocol_taken'])
-
-                try:
-                    generated_documents = generate_application_merged_docs(application)
-                    if not generated_documents: continue
-
-                    protocol_call_configuration = CallTitulusConfiguration.objects.filter(
-                        call=application.call,
-                        is_active=True
-                    ).select_related('configuration').first()
-
-                    protocol_response = application_protocol(
-                        application=application,
-                        user=application.user,
-                        subject=application.call.title_it,
-                        global_configuration=protocol_call_configuration.configuration,
-                        call_configuration=protocol_call_configuration,
-                        test=False,
+            executor = None
+            futures = {}
+            if options['workers'] > 1:
+                pks = list(applications.values_list('pk', flat=True))
+                # forked processes must not share the parent db connections
+                connections.close_all()
+                executor = ProcessPoolExecutor(
+                    max_workers=options['workers'],
+                    initializer=django.setup
+                )
+                futures = {pk: executor.submit(generate_docs, pk) for pk in pks}
+                print(f'{len(pks)} applications documents queued on {options["workers"]} workers')
+
+            try:
+                self.register(applications, futures)
+            finally:
+                if executor: executor.shutdown(cancel_futures=True)
+
+    def register(self, applications, futures):
+        for index, application in enumerate(applications):
+
+            if index: time.sleep(REGISTRATION_JOB_SLEEP_TIME)
+
+            application.refresh_from_db()
+            if application.protocol_taken: continue
+
+            print(f'[{application}] - Registering application {application.pk} - {application.call.title_it}')
+
+            application.protocol_taken = timezone.localtime()
+            application.save(update_fields=['protocol_taken'])
+
+            try:
+                future = futures.get(application.pk)
+                # docs generated in the pool are found ready
+                if future and not future.result():
+                    logger.warning(f'[{application}] documents generation failed in worker')
+                generated_documents = generate_application_merged_docs(application)
+                if not generated_documents: continue
+
+                protocol_call_configuration = CallTitulusConfiguration.objects.filter(
+                    call=application.call,
+                    is_active=True
+                ).select_related('configuration').first()
+
+                protocol_response = application_protocol(
+                    application=application,
+                    user=application.user,
+                    subject=application.call.title_it,
+                    global_configuration=protocol_call_configuration.configuration,
+                    call_configuration=protocol_call_configuration,
+                    test=False,
+                )
+
+                protocol_number = protocol_response["numero"]
+
+                # set protocol data in application
+                application.protocol_number = protocol_number
+                application.protocol_date = timezone.localtime()
+                application.save(
+                    update_fields=[
+                        "protocol_number",
+                        "protocol_date"
+                    ]
+                )
+
+                logger.info(
+                    "[{}] utente {} richiesta {} protocollata con successo: n. <b>{}/{}</b>".format(
+                        timezone.localtime(),
+                        application.user,
+                        application.pk,
+                        protocol_number,
+                        timezone.localtime().year
                     )
-
-                    protocol_number = protocol_response["numero"]
-
-                    # set protocol data in application
-                    application.protocol_number = protocol_number
-                    application.protocol_date = timezone.localtime()
-                    application.save(
-                        update_fields=[
-                            "protocol_number",
-                            "protocol_date"
-                        ]
+                )
+
+                print(f'[{application}] - Registered application {application.pk} - {application.call.title_it} COMPLETED')
+
+            # if protocol fails
+            # raise Exception and do some operations
+            except Exception as e:
+                # log protocol fails
+                logger.exception(
+                    "[{}] utente {} protocollo domanda {} fallito: {}".format(
+                        timezone.localtime(),
+                        application.user,
+                        application,
+                        e
                     )
+                )
 
-                    logger.info(
-                        "[{}] utente {} richiesta {} protocollata con successo: n. <b>{}/{}</b>".format(
-                            timezone.localtime(),
-                            application.user,
-                            application.pk,
-                            protocol_number,
-                            timezone.localtime().year
-                        )
-                    )
-
-                    print(f'[{application}] - Registered application {application.pk} - {application.call.title_it} COMPLETED')
-
-                # if protocol fails
-                # raise Exception and do some operations
-                except Exception as e:
-                    # log protocol fails
-                    logger.exception(
-                        "[{}] utente {} protocollo domanda {} fallito: {}".format(
-                            timezone.localtime(),
-                            application.user,
-                            application,
-                            e
-                        )
-                    )
-
-                    application.protocol_taken = None
-                    application.save(update_fields=['protocol_taken'])
+                application.protocol_taken = None
+                application.save(update_fields=['protocol_taken'])
 
-                    print(f'[{application}] - Registered application {application.pk} - {application.call.title_it} FAILED')
+                print(f'[{application}] - Registered application {application.pk} - {application.call.title_it} FAILED')
 
-                    continue
+                continue
 
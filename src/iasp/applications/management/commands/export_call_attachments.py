@@ -0,0 +1,36 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from calls.models import Call
+
+from ... utils import call_attachments_zip
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'IASP - export the attachments of the submitted applications of a call in a ZIP file'
+
+    def add_arguments(self, parser):
+        parser.epilog = 'Example: ./manage.py export_call_attachments 12 -o bando-12.zip'
+        parser.add_argument('call', type=int,
+                            help="call id")
+        parser.add_argument('-o', '--output', type=str, required=False,
+                            help="ZIP file path, default bando-<call>-allegati.zip")
+
+    def handle(self, *args, **options):
+        call = Call.objects.filter(pk=options['call']).first()
+        if not call:
+            raise CommandError(f"Call {options['call']} not found")
+
+        output = options['output'] or f'bando-{call.pk}-allegati.zip'
+        size = 0
+        with open(output, 'wb') as f:
+            for data in call_attachments_zip(call):
+                f.write(data)
+                size += len(data)
+
+        print(f'{output} ({size} bytes)')
+        logger.info(f'[call {call.pk}] attachments exported in {output}')
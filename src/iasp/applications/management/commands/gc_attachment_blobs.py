@@ -0,0 +1,71 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+
+from generics.settings import BLOB_STORAGE_PATH
+from generics.storage import link_or_copy
+
+from ... models import attachments_storage
+
+
+class Command(BaseCommand):
+    help = 'IASP - remove attachment blobs not referenced anymore'
+
+    def add_arguments(self, parser):
+        parser.epilog = 'Example: ./manage.py gc_attachment_blobs --link-existing allegati'
+        parser.add_argument('--link-existing', type=str, required=False, metavar='FOLDER',
+                            help="before, move files of this media folder not yet linked into blobs")
+        parser.add_argument('--dry-run', required=False, action="store_true",
+                            help="only print what would be done")
+
+    def link_existing(self, folder, dry_run):
+        linked = 0
+        saved = 0
+        for root, dirs, files in os.walk(attachments_storage.path(folder)):
+            for filename in files:
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                if stat.st_nlink > 1: continue
+
+                sha256 = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(64 * 1024), b''):
+                        sha256.update(chunk)
+                blob = attachments_storage.blob_path(sha256.hexdigest())
+                exists = os.path.exists(blob)
+                print(f'{path} -> {blob}{" (duplicate)" if exists else ""}')
+                linked += 1
+                if exists: saved += stat.st_size
+                if dry_run: continue
+
+                if exists:
+                    # replaced atomically by a link to the blob
+                    tmp_path = f'{path}.{os.getpid()}.tmp'
+                    link_or_copy(blob, tmp_path)
+                    os.replace(tmp_path, path)
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.link(path, blob)
+        print(f'{linked} files linked, {saved} bytes freed')
+
+    def handle(self, *args, **options):
+        if options['link_existing']:
+            self.link_existing(options['link_existing'], options['dry_run'])
+
+        removed = 0
+        freed = 0
+        blobs_path = attachments_storage.path(BLOB_STORAGE_PATH)
+        for root, dirs, files in os.walk(blobs_path):
+            for filename in files:
+                path = os.path.join(root, filename)
+                stat = os.stat(path)
+                # the blob itself is the only link left
+                if stat.st_nlink > 1: continue
+                print(f'{path} removed')
+                removed += 1
+                freed += stat.st_size
+                if not options['dry_run']:
+                    os.remove(path)
+
+        print(f'{removed} blobs removed, {freed} bytes freed')
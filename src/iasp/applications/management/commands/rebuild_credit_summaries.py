@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from ... models import Application, ApplicationCreditsSummary, compute_credits_summary
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'IASP - rebuild applications credits summaries from scratch'
+
+    def add_arguments(self, parser):
+        parser.epilog = 'Example: ./manage.py rebuild_credit_summaries --check'
+        parser.add_argument('--call', type=int, required=False,
+                            help="only applications of this call")
+        parser.add_argument('--check', required=False, action="store_true",
+                            help="only verify stored summaries, without saving")
+
+    def handle(self, *args, **options):
+        applications = Application.objects.select_related('credits_summary')
+        if options['call']:
+            applications = applications.filter(call_id=options['call'])
+
+        inconsistent = 0
+        for application in applications.iterator(chunk_size=500):
+            data = compute_credits_summary(application.pk)
+            summary = getattr(application, 'credits_summary', None)
+
+            if summary and (
+                summary.declared_credits == data['declared_credits'] and
+                summary.reviewed_credits == data['reviewed_credits'] and
+                summary.subtotals == data['subtotals']
+            ):
+                continue
+
+            inconsistent += 1
+            if not summary:
+                print(f'[{application.pk}] {application} - summary missing')
+            else:
+                print(
+                    f'[{application.pk}] {application} - '
+                    f'declared {summary.declared_credits} -> {data["declared_credits"]}, '
+                    f'reviewed {summary.reviewed_credits} -> {data["reviewed_credits"]}'
+                )
+
+            if options['check']: continue
+
+            ApplicationCreditsSummary.objects.update_or_create(
+                application=application,
+                defaults=data
+            )
+            logger.info(f'[{application.pk}] {application} credits summary rebuilt')
+
+        print(f'{inconsistent} summaries {"inconsistent" if options["check"] else "rebuilt"}')
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("applications", "0005_alter_application_call"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ApplicationCreditsSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "declared_credits",
+                    models.DecimalField(decimal_places=1, default=0, max_digits=6),
+                ),
+                (
+                    "reviewed_credits",
+                    models.DecimalField(decimal_places=1, default=0, max_digits=6),
+                ),
+                ("subtotals", models.JSONField(default=dict)),
+                ("modified", models.DateTimeField(auto_now=True)),
+                (
+                    "application",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="credits_summary",
+                        to="applications.application",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("applications", "0006_applicationcreditssummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="attachments_info",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="applicationinsertionfree",
+            name="attachments_info",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="applicationinsertionrequired",
+            name="attachments_info",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
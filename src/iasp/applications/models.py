@@ -2,12 +2,27 @@ import os
 from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import F, Case, When, Sum
+from django.db import models, transaction
+from decimal import Decimal
+from django.db.models import (
+    DecimalField,
+    Exists,
+    F,
+    Case,
+    OuterRef,
+    Subquery,
+    When,
+    Min,
+    Sum,
+    Value
+)
+from django.db.models.functions import Coalesce, Least
 from django.db.models.fields.files import FileField
 
 from calls.models import Call, CallFreeCreditsRule
 from generics.models import *
+from generics.storage import BlobFileSystemStorage
+from generics.utils import memoized
 
 from . settings import COUNTRIES
 from . validators import *
@@ -16,6 +31,10 @@ from . validators import *
 # ~ CommissionLogModel = apps.get_model('management', 'ApplicationInsertionCommissionReviewLogUser')
 
 
+# identical uploads are stored once
+attachments_storage = BlobFileSystemStorage()
+
+
 def _attachment_path_required(instance, filename):
     # file will be uploaded to MEDIA_ROOT
     return "allegati/bando-{0}/domanda-{1}/obbligatori/{2}-anno/{3}".format(
@@ -45,7 +64,91 @@ def _attachment_path_application(instance, filename):
     )
 
 
-class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
+def _insertion_credits(show_commission_review=False):
+    if show_commission_review:
+        # commission review, if present, overrides declared credits
+        return Coalesce('review__changed_credits', 'source_teaching_credits')
+    return F('source_teaching_credits')
+
+
+def _capped_credits_subquery(insertions, group_field, cap_field, show_commission_review):
+    """
+    Correlated subquery that returns, for each application,
+    the sum of the insertions credits capped per group.
+    Credits are summed on the first row of each group only
+    """
+    same_group = insertions.filter(
+        application_id=OuterRef('application_id'),
+        **{group_field: OuterRef(group_field)}
+    )
+    group_credits = (
+        same_group
+        .order_by()
+        .values(group_field)
+        .annotate(
+            capped_credits=Least(
+                Sum(_insertion_credits(show_commission_review)),
+                Min(cap_field)
+            )
+        )
+        .values('capped_credits')
+    )
+    return Subquery(
+        insertions
+        .filter(application_id=OuterRef('pk'))
+        .exclude(Exists(same_group.filter(pk__lt=OuterRef('pk'))))
+        .annotate(capped_credits=Subquery(group_credits))
+        .order_by()
+        .values('application_id')
+        .annotate(tot=Sum('capped_credits'))
+        .values('tot'),
+        output_field=DecimalField(max_digits=6, decimal_places=1)
+    )
+
+
+class ApplicationQuerySet(models.QuerySet):
+    def with_credits_status(self, show_commission_review=False):
+        """
+        Annotates tot_credits, same value of get_credits_status(),
+        for all the applications in a constant number of queries.
+        Applications without a credits summary are computed on the fly
+        """
+        required = ApplicationInsertionRequired.objects.filter(
+            target_teaching_year__lte=F('application__call__credits_reference_year')
+        )
+        free = ApplicationInsertionFree.objects.filter(
+            free_credits__course_year__lte=F('application__call__credits_reference_year'),
+            free_credits__is_active=True
+        )
+        zero = Value(Decimal('0'), output_field=DecimalField(max_digits=6, decimal_places=1))
+        computed = Coalesce(
+            _capped_credits_subquery(
+                required,
+                'target_teaching_id',
+                'target_teaching_credits',
+                show_commission_review
+            ),
+            zero
+        ) + Coalesce(
+            _capped_credits_subquery(
+                free,
+                'free_credits_id',
+                'free_credits__max_value',
+                show_commission_review
+            ),
+            zero
+        )
+        # stored summary if present, computed otherwise
+        summary_field = 'reviewed_credits' if show_commission_review else 'declared_credits'
+        return self.annotate(
+            tot_credits=Coalesce(
+                F(f'credits_summary__{summary_field}'),
+                computed
+            )
+        )
+
+
+class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel, MemoizedModel, AttachmentsInfoModel):
     user = models.ForeignKey(get_user_model(), on_delete=models.PROTECT)
     call = models.ForeignKey(Call, on_delete=models.PROTECT, related_name="applications")
     user_country = models.CharField(
@@ -63,6 +166,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     home_course = models.CharField(max_length=255)
     home_exams_certification = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -71,6 +175,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     )
     home_teaching_plan = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -79,6 +184,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     )
     home_votes_conversion = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -89,6 +195,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     )
     home_language_certification = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -99,6 +206,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     )
     declaration_of_value = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -109,6 +217,7 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     )
     payment_receipt = models.FileField(
         upload_to=_attachment_path_application,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -122,6 +231,8 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     protocol_date = models.DateTimeField(blank=True, null=True)
     protocol_taken = models.DateTimeField(blank=True, null=True)
 
+    objects = ApplicationQuerySet.as_manager()
+
     def get_filefield_attributes(self):
         file_fields = []
         for field in self._meta.get_fields():
@@ -129,9 +240,11 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
                 file_fields.append(field.name)
         return file_fields
 
+    @memoized
     def is_editable(self):
         return self.call.is_in_progress() and not self.submission_date
 
+    @memoized
     def is_submittabile(self):
         if not self.is_editable():
             return False
@@ -139,80 +252,125 @@ class Application(ActivableModel, CreatedModifiedBy, TimeStampedModel):
             return False
         return self.get_credits_status() >= self.call.credits_threshold
 
+    def get_credits_summary(self):
+        try:
+            return self.credits_summary
+        except ApplicationCreditsSummary.DoesNotExist:
+            # created on first read
+            return update_credits_summary(self.pk)
+
+    @memoized
     def get_credits_status(self, show_commission_review=False):
-        # ~ tot_required = 0
-
-        # ~ required_insertions = (
-            # ~ ApplicationInsertionRequired.objects
-            # ~ .filter(
-                # ~ application=self,
-                # ~ target_teaching_year__lte=self.call.credits_reference_year
-            # ~ )
-            # ~ .values('target_teaching_id', 'target_teaching_credits')
-            # ~ .annotate(total_source_credits=Sum('source_teaching_credits'))
-        # ~ )
-
-        # ~ for req in required_insertions:
-            # ~ tot_required += min(req['total_source_credits'], req['target_teaching_credits'])
-
-        # ~ free_insertions = ApplicationInsertionFree.objects.filter(
-            # ~ application=self,
-            # ~ free_credits__course_year__lte=self.call.credits_reference_year,
-            # ~ free_credits__is_active=True
-        # ~ ).annotate(
-            # ~ min_credits=Case(
-                # ~ When(source_teaching_credits__lt=F('free_credits__max_value'), then=F('source_teaching_credits')),
-                # ~ default=F('free_credits__max_value')
-            # ~ )
-        # ~ )
-
-        tot_required = 0
-        tot_free = 0
-
-        # required
-        required_insertions = (
-            ApplicationInsertionRequired.objects
-            .filter(
-                application=self,
-                target_teaching_year__lte=self.call.credits_reference_year
+        summary = self.get_credits_summary()
+        if show_commission_review:
+            return summary.reviewed_credits
+        return summary.declared_credits
+
+
+def _capped_subtotals(insertions, group_field, cap_field):
+    """
+    Declared and reviewed credits per group, capped to cap_field
+    """
+    rows = (
+        insertions
+        .order_by()
+        .values(group_field)
+        .annotate(
+            declared=Least(
+                Sum(_insertion_credits(False)),
+                Min(cap_field)
+            ),
+            reviewed=Least(
+                Sum(_insertion_credits(True)),
+                Min(cap_field)
             )
         )
-
-        _limits = {}
-        for req in required_insertions:
-            if not _limits.get(req.target_teaching_id, None):
-                _limits[req.target_teaching_id] = req.get_credits(show_commission_review)
-            else:
-                _limits[req.target_teaching_id] += req.get_credits(show_commission_review)
-            if _limits[req.target_teaching_id] > req.target_teaching_credits:
-                _limits[req.target_teaching_id] = req.target_teaching_credits
-
-        for course in _limits:
-            tot_required += _limits[course]
-
-        # free
-        free_insertions = ApplicationInsertionFree.objects.filter(
-            application=self,
-            free_credits__course_year__lte=self.call.credits_reference_year,
+    )
+    return {
+        str(row[group_field]): {
+            'declared': row['declared'],
+            'reviewed': row['reviewed']
+        }
+        for row in rows
+    }
+
+
+def compute_credits_summary(application_id):
+    """
+    Recomputes the credits summary of an application from scratch
+    """
+    required = _capped_subtotals(
+        ApplicationInsertionRequired.objects.filter(
+            application_id=application_id,
+            target_teaching_year__lte=F('application__call__credits_reference_year')
+        ),
+        'target_teaching_id',
+        'target_teaching_credits'
+    )
+    free = _capped_subtotals(
+        ApplicationInsertionFree.objects.filter(
+            application_id=application_id,
+            free_credits__course_year__lte=F('application__call__credits_reference_year'),
             free_credits__is_active=True
+        ),
+        'free_credits_id',
+        'free_credits__max_value'
+    )
+    subtotals = [*required.values(), *free.values()]
+    return {
+        'declared_credits': sum((s['declared'] for s in subtotals), Decimal('0')),
+        'reviewed_credits': sum((s['reviewed'] for s in subtotals), Decimal('0')),
+        'subtotals': {
+            'required': {k: {t: str(v) for t, v in s.items()} for k, s in required.items()},
+            'free': {k: {t: str(v) for t, v in s.items()} for k, s in free.items()}
+        }
+    }
+
+
+def update_credits_summary(application_id):
+    """
+    Refreshes the credits summary of an application, creating it
+    if missing. The row is locked before computing the credits, so
+    concurrent changes are applied in order
+    """
+    with transaction.atomic():
+        summary, created = ApplicationCreditsSummary.objects.select_for_update().get_or_create(
+            application_id=application_id
         )
+        for field, value in compute_credits_summary(application_id).items():
+            setattr(summary, field, value)
+        summary.save()
+    return summary
+
+
+def update_insertion_credits_summary(insertion):
+    update_credits_summary(insertion.application_id)
+    # drop stale summary cached on the application instance
+    if type(insertion).application.is_cached(insertion):
+        application = insertion.application
+        if Application.credits_summary.is_cached(application):
+            Application.credits_summary.related.delete_cached_value(application)
+        application.clear_memo()
+
+
+class ApplicationCreditsSummary(models.Model):
+    application = models.OneToOneField(
+        Application,
+        on_delete=models.CASCADE,
+        related_name="credits_summary"
+    )
+    declared_credits = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    reviewed_credits = models.DecimalField(max_digits=6, decimal_places=1, default=0)
+    # {'required': {target_teaching_id: {'declared': x, 'reviewed': y}},
+    #  'free': {free_credits_id: {'declared': x, 'reviewed': y}}}
+    subtotals = models.JSONField(default=dict)
+    modified = models.DateTimeField(auto_now=True)
 
-        _limits = {}
-        for free in free_insertions:
-            if not _limits.get(free.free_credits_id, None):
-                _limits[free.free_credits_id] = free.get_credits(show_commission_review)
-            else:
-                _limits[free.free_credits_id] += free.get_credits(show_commission_review)
-            if _limits[free.free_credits_id] > free.free_credits.max_value:
-                _limits[free.free_credits_id] = free.free_credits.max_value
-        for rule in _limits:
-            tot_free += _limits[rule]
-
-        # tot
-        return tot_required + tot_free
+    def __str__(self):
+        return f'{self.application}'
 
 
-class ApplicationInsertion(ActivableModel, CreatedModifiedBy, TimeStampedModel):
+class ApplicationInsertion(ActivableModel, CreatedModifiedBy, TimeStampedModel, AttachmentsInfoModel):
     application = models.ForeignKey(Application, on_delete=models.CASCADE)
     source_university = models.CharField(max_length=255)
     source_university_country = models.CharField(
@@ -232,6 +390,7 @@ class ApplicationInsertion(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     source_teaching_ssd = models.CharField(max_length=10, blank=True, default='')
     source_teaching_attachment = models.FileField(
         upload_to=_attachment_path_required,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -276,6 +435,7 @@ class ApplicationInsertionRequired(ApplicationInsertion):
 class ApplicationInsertionFree(ApplicationInsertion):
     source_teaching_attachment = models.FileField(
         upload_to=_attachment_path_free,
+        storage=attachments_storage,
         validators=[
             validate_attachment_extension,
             validate_file_size
@@ -6,8 +6,24 @@ PDF_TEMP_FOLDER_PATH = getattr(settings, "PDF_TEMP_FOLDER_PATH", f"temp/applicat
 PDF_TEMP_FOLDER_ATTACHMENTS_PATH = getattr(settings, "PDF_TEMP_FOLDER_ATTACHMENTS_PATH", f"attachments")
 PDF_TO_MERGE_TEMP_FOLDER_PATH = getattr(settings, "PDF_TO_MERGE_TEMP_FOLDER_PATH", f"to_merge")
 
+# static files, parsed once per process
+PDF_STYLESHEETS = getattr(settings, "PDF_STYLESHEETS", ["css/bootstrap-italia.min.css"])
+
+# all the insertion forms of an application rendered in one document
+PDF_INSERTIONS_SINGLE_DOCUMENT = getattr(settings, "PDF_INSERTIONS_SINGLE_DOCUMENT", True)
+
+# to increase when base templates or stylesheets change,
+# to regenerate the applications docs not yet registered
+PDF_DOSSIER_VERSION = getattr(settings, "PDF_DOSSIER_VERSION", 1)
+
 REGISTRATION_JOB_SLEEP_TIME = getattr(settings, "REGISTRATION_JOB_SLEEP_TIME", 180) # in seconds
 
+# attachments downloads served by the web server after Django checks permissions
+# None (streamed by Django), "x-accel-redirect" (nginx) or "x-sendfile" (apache)
+DOWNLOAD_OFFLOAD = getattr(settings, "DOWNLOAD_OFFLOAD", None)
+# nginx internal location mapped on MEDIA_ROOT
+DOWNLOAD_X_ACCEL_REDIRECT_PREFIX = getattr(settings, "DOWNLOAD_X_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+
 EMAIL_BODY = getattr(settings, "EMAIL_BODY", _("""Dear {first_name} {last_name},
 your application to participate in
 
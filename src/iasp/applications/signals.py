@@ -0,0 +1,37 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from calls.models import Call, CallFreeCreditsRule
+
+from . models import *
+
+
+def update_call_credits_summaries(call_id):
+    application_ids = ApplicationCreditsSummary.objects.filter(
+        application__call_id=call_id
+    ).values_list('application_id', flat=True)
+    for application_id in application_ids:
+        update_credits_summary(application_id)
+
+
+@receiver(post_save, sender=ApplicationInsertionRequired)
+@receiver(post_delete, sender=ApplicationInsertionRequired)
+@receiver(post_save, sender=ApplicationInsertionFree)
+@receiver(post_delete, sender=ApplicationInsertionFree)
+def insertion_changed(sender, instance, origin=None, **kwargs):
+    # deleted with the application, summary included
+    if isinstance(origin, Application) or getattr(origin, 'model', None) is Application:
+        return
+    update_insertion_credits_summary(instance)
+
+
+@receiver(post_save, sender=CallFreeCreditsRule)
+@receiver(post_delete, sender=CallFreeCreditsRule)
+def free_credits_rule_changed(sender, instance, **kwargs):
+    update_call_credits_summaries(instance.call_id)
+
+
+@receiver(post_save, sender=Call)
+def call_post_save(sender, instance, created, **kwargs):
+    if getattr(instance, '_credits_reference_year_changed', False):
+        update_call_credits_summaries(instance.pk)
@@ -1,3 +1,542 @@
-from django.test import TestCase
+import io
+import os
+import pypdf
+import tempfile
+import zipfile
 
-# Create your tests here.
+from decimal import Decimal
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from calls.models import Call, CallFreeCreditsRule
+from calls.testing import fake_fetch_course_data
+
+from management.models import (ApplicationInsertionFreeCommissionReview,
+                               ApplicationInsertionRequiredCommissionReview)
+
+from . models import (Application,
+                      ApplicationCreditsSummary,
+                      ApplicationInsertionFree,
+                      ApplicationInsertionRequired,
+                      compute_credits_summary)
+from . settings import PDF_TEMP_FOLDER_PATH
+from . utils import (call_attachments_zip,
+                     generate_application_docs,
+                     generate_application_merged_docs,
+                     get_insertion_sections)
+
+
+def make_pdf(pages=1):
+    writer = pypdf.PdfWriter()
+    for page in range(pages):
+        writer.add_blank_page(200, 200)
+    content = io.BytesIO()
+    writer.write(content)
+    return content.getvalue()
+
+
+class ApplicationTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        fetch = mock.patch('calls.models.fetch_course_data', side_effect=fake_fetch_course_data)
+        fetch.start()
+        self.addCleanup(fetch.stop)
+
+        self.user = get_user_model().objects.create(
+            username='student',
+            email='student@example.org',
+            taxpayer_id='STUDENT',
+            first_name='Name',
+            last_name='Surname'
+        )
+        self.call = Call.objects.create(
+            title_it='Bando',
+            title_en='Call',
+            course_cod='C1',
+            course_cohort=2024,
+            credits_threshold=10,
+            credits_reference_year=1,
+            study_plan_cod='A',
+            start=timezone.localtime() - timedelta(days=1),
+            end=timezone.localtime() + timedelta(days=10)
+        )
+        self.free_credits_rule = CallFreeCreditsRule.objects.create(
+            call=self.call,
+            course_year=1,
+            min_value=0,
+            max_value=Decimal('6')
+        )
+        self.application = Application.objects.create(
+            user=self.user,
+            call=self.call,
+            home_university='University',
+            home_city='City',
+            home_course='Course',
+            home_exams_certification=self.pdf_file('exams.pdf'),
+            home_teaching_plan=self.pdf_file('plan.pdf')
+        )
+
+    def pdf_file(self, name, pages=1):
+        return SimpleUploadedFile(name, make_pdf(pages), content_type='application/pdf')
+
+    def add_required_insertion(self, teaching_id, credits, **kwargs):
+        teaching = self.call.get_teaching_data(teaching_id)
+        return ApplicationInsertionRequired.objects.create(
+            **kwargs,
+            application=self.application,
+            source_university='University',
+            source_university_city='City',
+            source_degree_course='Course',
+            source_teaching_name='Source teaching',
+            source_teaching_cod='S1',
+            source_teaching_credits=Decimal(credits),
+            source_teaching_attachment=self.pdf_file('required.pdf', pages=2),
+            source_teaching_grade='30',
+            target_teaching_name=teaching['name'],
+            target_teaching_id=teaching_id,
+            target_teaching_cod=teaching['cod'],
+            target_teaching_credits=Decimal(str(teaching['credits'])),
+            target_teaching_ssd='MAT/05',
+            target_teaching_year=teaching['year']
+        )
+
+    def add_free_insertion(self, credits, free_credits_rule=None, **kwargs):
+        return ApplicationInsertionFree.objects.create(
+            **kwargs,
+            application=self.application,
+            free_credits=free_credits_rule or self.free_credits_rule,
+            source_university='University',
+            source_university_city='City',
+            source_degree_course='Course',
+            source_teaching_name='Source teaching',
+            source_teaching_cod='S2',
+            source_teaching_credits=Decimal(credits),
+            source_teaching_attachment=self.pdf_file('free.pdf', pages=3),
+            source_teaching_grade='30'
+        )
+
+
+class CreditsStatusTest(ApplicationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Call.objects.filter(pk=self.call.pk).update(credits_reference_year=2)
+        # capped to target teaching credits
+        first = self.add_required_insertion(10, '5')
+        self.add_required_insertion(10, '6')
+        second = self.add_required_insertion(11, '3')
+        self.add_required_insertion(20, '4')
+        # after the credits reference year
+        self.add_required_insertion(30, '4')
+        # capped to free credits rule max value
+        free = self.add_free_insertion('4')
+        self.add_free_insertion('4')
+        late_rule = CallFreeCreditsRule.objects.create(
+            call=self.call,
+            course_year=3,
+            min_value=0,
+            max_value=Decimal('6')
+        )
+        self.add_free_insertion('5', free_credits_rule=late_rule)
+        inactive_rule = CallFreeCreditsRule.objects.create(
+            call=self.call,
+            course_year=2,
+            min_value=0,
+            max_value=Decimal('6'),
+            is_active=False
+        )
+        self.add_free_insertion('5', free_credits_rule=inactive_rule)
+
+        for insertion, credits in ((first, '1'), (second, '0')):
+            ApplicationInsertionRequiredCommissionReview.objects.create(
+                insertion=insertion,
+                changed_credits=Decimal(credits),
+                changed_grade='30',
+                notes='notes'
+            )
+        ApplicationInsertionFreeCommissionReview.objects.create(
+            insertion=free,
+            changed_credits=Decimal('1.5'),
+            changed_grade='30',
+            notes='notes'
+        )
+
+    def annotated_credits(self, show_commission_review):
+        return Application.objects.with_credits_status(
+            show_commission_review
+        ).get(pk=self.application.pk).tot_credits
+
+    def legacy_credits_status(self, show_commission_review):
+        # per-insertion loop used before the aggregate queries, as reference
+        application = Application.objects.get(pk=self.application.pk)
+        total = 0
+        for insertions, group, cap in (
+            (
+                ApplicationInsertionRequired.objects.filter(
+                    application=application,
+                    target_teaching_year__lte=application.call.credits_reference_year
+                ),
+                lambda insertion: insertion.target_teaching_id,
+                lambda insertion: insertion.target_teaching_credits
+            ),
+            (
+                ApplicationInsertionFree.objects.filter(
+                    application=application,
+                    free_credits__course_year__lte=application.call.credits_reference_year,
+                    free_credits__is_active=True
+                ),
+                lambda insertion: insertion.free_credits_id,
+                lambda insertion: insertion.free_credits.max_value
+            )
+        ):
+            limits = {}
+            for insertion in insertions:
+                limits[group(insertion)] = min(
+                    limits.get(group(insertion), 0) + insertion.get_credits(show_commission_review),
+                    cap(insertion)
+                )
+            total += sum(limits.values())
+        return total
+
+    def test_matches_legacy_loop(self):
+        # declared: T10 5+6 capped to 9, T11 3, T20 4, free 4+4 capped to 6
+        # reviewed: T10 1+6, T11 0, T20 4, free 1.5+4
+        expected = {False: Decimal('22'), True: Decimal('16.5')}
+        for show_commission_review, credits in expected.items():
+            self.assertEqual(self.legacy_credits_status(show_commission_review), credits)
+            self.assertEqual(
+                Application.objects.get(pk=self.application.pk).get_credits_status(show_commission_review),
+                credits
+            )
+            self.assertEqual(self.annotated_credits(show_commission_review), credits)
+
+        # reviewed credits are capped too: T20 14 capped to 12
+        ApplicationInsertionRequiredCommissionReview.objects.create(
+            insertion=ApplicationInsertionRequired.objects.get(target_teaching_id=20),
+            changed_credits=Decimal('14'),
+            changed_grade='30',
+            notes='notes'
+        )
+        self.assertEqual(self.legacy_credits_status(True), Decimal('24.5'))
+        self.assertEqual(
+            Application.objects.get(pk=self.application.pk).get_credits_status(True),
+            Decimal('24.5')
+        )
+        self.assertEqual(self.annotated_credits(True), Decimal('24.5'))
+
+    def test_annotation_matches_summary(self):
+        summary = compute_credits_summary(self.application.pk)
+        self.assertEqual(summary['declared_credits'], Decimal('22'))
+        self.assertEqual(summary['reviewed_credits'], Decimal('16.5'))
+
+        # computed in the query, without a stored summary
+        ApplicationCreditsSummary.objects.filter(application=self.application).delete()
+        self.assertFalse(ApplicationCreditsSummary.objects.filter(application=self.application).exists())
+        self.assertEqual(self.annotated_credits(False), summary['declared_credits'])
+        self.assertEqual(self.annotated_credits(True), summary['reviewed_credits'])
+
+        # from the stored summary
+        self.application.get_credits_summary()
+        self.assertEqual(self.annotated_credits(False), summary['declared_credits'])
+        self.assertEqual(self.annotated_credits(True), summary['reviewed_credits'])
+
+    def test_application_without_insertions(self):
+        other = Application.objects.create(
+            user=self.user,
+            call=self.call,
+            home_university='University',
+            home_city='City',
+            home_course='Course',
+            home_exams_certification=self.pdf_file('exams.pdf'),
+            home_teaching_plan=self.pdf_file('plan.pdf')
+        )
+        annotated = Application.objects.with_credits_status().get(pk=other.pk)
+        self.assertEqual(annotated.tot_credits, Decimal('0'))
+        self.assertEqual(compute_credits_summary(other.pk)['declared_credits'], Decimal('0'))
+
+
+class CreditsSummaryTest(ApplicationTestCase):
+
+    def assertSummaryUpToDate(self):
+        summary = ApplicationCreditsSummary.objects.get(application=self.application)
+        expected = compute_credits_summary(self.application.pk)
+        self.assertEqual(summary.declared_credits, expected['declared_credits'])
+        self.assertEqual(summary.reviewed_credits, expected['reviewed_credits'])
+        self.assertEqual(summary.subtotals, expected['subtotals'])
+        return summary
+
+    def test_summary_follows_changes(self):
+        self.application.get_credits_summary()
+
+        insertion = self.add_required_insertion(10, '5')
+        free = self.add_free_insertion('4')
+        self.assertEqual(self.assertSummaryUpToDate().declared_credits, Decimal('9'))
+
+        review = ApplicationInsertionRequiredCommissionReview.objects.create(
+            insertion=insertion,
+            changed_credits=Decimal('2'),
+            changed_grade='30',
+            notes='notes'
+        )
+        self.assertEqual(self.assertSummaryUpToDate().reviewed_credits, Decimal('6'))
+
+        self.free_credits_rule.max_value = Decimal('3')
+        self.free_credits_rule.save()
+        self.assertEqual(self.assertSummaryUpToDate().declared_credits, Decimal('8'))
+
+        review.delete()
+        free.delete()
+        self.assertEqual(self.assertSummaryUpToDate().reviewed_credits, Decimal('5'))
+
+    def test_summary_follows_reference_year(self):
+        self.add_required_insertion(10, '5')
+        self.add_required_insertion(20, '6')
+        self.assertEqual(self.assertSummaryUpToDate().declared_credits, Decimal('5'))
+
+        self.call.credits_reference_year = 2
+        self.call.save()
+        self.assertEqual(self.assertSummaryUpToDate().declared_credits, Decimal('11'))
+
+    def test_summary_created_on_insertion_change(self):
+        self.add_required_insertion(10, '5')
+        self.assertEqual(self.assertSummaryUpToDate().declared_credits, Decimal('5'))
+
+    def test_application_delete(self):
+        self.add_required_insertion(10, '5')
+        self.application.delete()
+        self.assertFalse(ApplicationCreditsSummary.objects.exists())
+
+    def test_credits_status_after_insertion_change(self):
+        self.assertEqual(self.application.get_credits_status(), Decimal('0'))
+        self.add_required_insertion(10, '5')
+        # summary and memoized status cached on the instance are dropped
+        self.assertEqual(self.application.get_credits_status(), Decimal('5'))
+
+
+class FakePdfRenderer:
+    """
+    Writes a page per document, or per section
+    """
+
+    def __init__(self):
+        self.rendered = []
+
+    def render(self, template_name, context, target=None):
+        self.rendered.append(template_name)
+        with open(target, 'wb') as f:
+            f.write(make_pdf())
+
+    def render_sections(self, template_name, context, target):
+        self.rendered.append(template_name)
+        with open(target, 'wb') as f:
+            f.write(make_pdf(len(context['sections'])))
+        return {section['anchor']: index for index, section in enumerate(context['sections'])}
+
+
+class ApplicationDossierTest(ApplicationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.add_required_insertion(10, '6')
+        self.add_free_insertion('4')
+        self.renderer = FakePdfRenderer()
+        renderer = mock.patch('applications.utils.get_pdf_renderer', return_value=self.renderer)
+        renderer.start()
+        self.addCleanup(renderer.stop)
+
+    def generate(self):
+        self.renderer.rendered.clear()
+        application = Application.objects.get(pk=self.application.pk)
+        self.assertTrue(generate_application_merged_docs(application))
+        return self.renderer.rendered
+
+    def folder_path(self, *path):
+        return os.path.join(settings.MEDIA_ROOT, PDF_TEMP_FOLDER_PATH, str(self.application.pk), *path)
+
+    def merged_pages(self):
+        return len(pypdf.PdfReader(self.folder_path('attachments', 'inserimenti.pdf')).pages)
+
+    def test_unchanged_inputs_reuse_docs(self):
+        self.assertEqual(
+            self.generate(),
+            ['print/application.html', 'print/application_insertions.html']
+        )
+        # form page and attachment pages of each insertion
+        self.assertEqual(self.merged_pages(), 1 + 2 + 1 + 3)
+        self.assertEqual(self.generate(), [])
+
+    def test_changed_inputs_regenerate_docs(self):
+        self.generate()
+
+        insertion = self.application.applicationinsertionrequired_set.get()
+        insertion.source_teaching_grade = '28'
+        insertion.save()
+        self.assertEqual(self.generate(), ['print/application_insertions.html'])
+
+        # last modification is printed in the application pdf
+        self.application.save()
+        self.assertEqual(self.generate(), ['print/application.html'])
+
+        self.add_free_insertion('2')
+        self.assertEqual(self.generate(), ['print/application_insertions.html'])
+        self.assertEqual(self.merged_pages(), 1 + 2 + 1 + 3 + 1 + 3)
+
+    def test_missing_files_regenerate_docs(self):
+        self.generate()
+
+        os.remove(self.folder_path('domanda.pdf'))
+        self.assertEqual(self.generate(), ['print/application.html'])
+
+        os.remove(self.folder_path('moduli.pdf'))
+        self.assertEqual(self.generate(), ['print/application_insertions.html'])
+
+        os.remove(self.folder_path('attachments', 'home_teaching_plan.pdf'))
+        self.assertEqual(self.generate(), [])
+        self.assertTrue(os.path.exists(self.folder_path('attachments', 'home_teaching_plan.pdf')))
+
+
+class InsertionSectionsTest(ApplicationTestCase):
+
+    def test_sections_order(self):
+        self.add_free_insertion('2', pk=1000)
+        self.add_free_insertion('2', pk=5)
+        self.add_required_insertion(10, '3', pk=1000)
+        self.add_required_insertion(11, '3', pk=999)
+        self.add_required_insertion(20, '3', pk=7)
+
+        self.assertEqual(
+            [section['anchor'] for section in get_insertion_sections(self.application)],
+            ['required-7', 'required-999', 'required-1000', 'free-5', 'free-1000']
+        )
+
+    @mock.patch('applications.utils.PDF_INSERTIONS_SINGLE_DOCUMENT', False)
+    @mock.patch('applications.utils.get_pdf_renderer', return_value=FakePdfRenderer())
+    def test_legacy_files_order(self, renderer):
+        self.add_free_insertion('2', pk=5)
+        self.add_required_insertion(10, '3', pk=1000)
+        self.add_required_insertion(11, '3', pk=999)
+
+        to_merge, forms_pages = generate_application_docs(
+            self.application,
+            get_insertion_sections(self.application)
+        )
+        self.assertEqual(
+            [os.path.basename(path) for path, pages_range in to_merge],
+            [
+                'required-999-a.pdf', 'required-999-file.pdf',
+                'required-1000-a.pdf', 'required-1000-file.pdf',
+                'zfree-005-a.pdf', 'zfree-005-file.pdf'
+            ]
+        )
+
+
+class AttachmentDownloadTest(ApplicationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.url = reverse(
+            'applications:download_teaching_plan',
+            kwargs={'application_pk': self.application.pk}
+        )
+        with self.application.home_teaching_plan.open('rb') as f:
+            self.content = f.read()
+        self.etag = f'"{self.application.get_attachment_info("home_teaching_plan")["sha256"]}"'
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Last-Modified', response)
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+    def test_range_not_satisfiable(self):
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertIn('Last-Modified', response)
+
+    def test_if_range(self):
+        # changed file, full content
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+
+
+class CallAttachmentsZipTest(ApplicationTestCase):
+
+    def test_zip(self):
+        required = self.add_required_insertion(10, '5')
+        free = self.add_free_insertion('4')
+        # not submitted, not exported
+        Application.objects.create(
+            user=get_user_model().objects.create(username='other', taxpayer_id='OTHER'),
+            call=self.call,
+            home_university='University',
+            home_city='City',
+            home_course='Course',
+            home_exams_certification=self.pdf_file('exams.pdf'),
+            home_teaching_plan=self.pdf_file('plan.pdf')
+        )
+        Application.objects.filter(pk=self.application.pk).update(submission_date=timezone.localtime())
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(call_attachments_zip(self.call, chunk_size=64))))
+        self.assertIsNone(archive.testzip())
+        folder = 'Surname_Name_STUDENT'
+        self.assertEqual(
+            archive.namelist(),
+            [
+                f'{folder}/home_exams_certification.pdf',
+                f'{folder}/home_teaching_plan.pdf',
+                f'{folder}/obbligatori/1-anno/{required.pk}-{os.path.basename(required.source_teaching_attachment.name)}',
+                f'{folder}/scelta/1-anno/{free.pk}-{os.path.basename(free.source_teaching_attachment.name)}'
+            ]
+        )
+        with free.source_teaching_attachment.open('rb') as f:
+            self.assertEqual(archive.read(archive.namelist()[-1]), f.read())
+
+    def test_missing_files_are_skipped(self):
+        Application.objects.filter(pk=self.application.pk).update(submission_date=timezone.localtime())
+        os.remove(self.application.home_exams_certification.path)
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(call_attachments_zip(self.call))))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['Surname_Name_STUDENT/home_teaching_plan.pdf'])
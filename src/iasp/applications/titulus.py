@@ -1,13 +1,9 @@
 import logging
-import magic
 import os
 
 from django.conf import settings
-from django.http import HttpResponse
 from django.utils.translation import gettext_lazy as _
 
-from io import BytesIO
-
 from pathlib import Path
 
 from titulus_ws import settings as titulus_settings
@@ -132,47 +128,25 @@ def application_protocol(
         f'{PDF_TEMP_FOLDER_PATH}/{application.pk}',
         'domanda.pdf'
     )
-    mime = magic.Magic(mime=True)
-    content_type = mime.from_file(principal_file_path)
-    principal_file = open(principal_file_path, "rb")
-    principal_file_response = HttpResponse(
-        principal_file.read(),
-        content_type=content_type
-    )
-    principal_file_name = principal_file.name.split('/')[-1]
-    principal_file_response["Content-Disposition"] = "inline; filename=" + principal_file_name
-    principal_file.close()
-    principal_file_bytes = BytesIO()
-    principal_file_bytes.write(principal_file_response.content)
-    principal_file_bytes.seek(0)
-
-    wsclient.aggiungi_docPrinc(
-        fopen=principal_file_bytes,
-        nome_doc=principal_file_name,
-        tipo_doc=principal_file_name,
-    )
+    principal_file_name = os.path.basename(principal_file_path)
+    with open(principal_file_path, "rb") as principal_file:
+        wsclient.aggiungi_docPrinc(
+            fopen=principal_file,
+            nome_doc=principal_file_name,
+            tipo_doc=principal_file_name,
+        )
     # end principal file
 
     # attachments
     for attachment in attachments:
-        content_type = mime.from_file(attachment)
-        f = open(attachment, "rb")
-        attachment_response = HttpResponse(
-            f.read(),
-            content_type=content_type
-        )
-        attachment_name = f.name.split('/')[-1]
-        attachment_response["Content-Disposition"] = "inline; filename=" + attachment_name
-        f.close()
-        attachment_bytes = BytesIO()
-        attachment_bytes.write(attachment_response.content)
-        attachment_bytes.seek(0)
-        wsclient.aggiungi_allegato(
-            nome=attachment_name,
-            descrizione=os.path.splitext(attachment_name)[0],
-            fopen=attachment_bytes,
-            test=test
-        )
+        attachment_name = attachment.name
+        with open(attachment, "rb") as f:
+            wsclient.aggiungi_allegato(
+                nome=attachment_name,
+                descrizione=os.path.splitext(attachment_name)[0],
+                fopen=f,
+                test=test
+            )
     # end attachments
 
     wsclient.protocolla(test=test)
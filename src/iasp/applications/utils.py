@@ -1,28 +1,39 @@
+import hashlib
+import json
 import logging
 import os
-import pypdf
-import shutil
+import zipfile
 
 from django.conf import settings
-from django.contrib.staticfiles import finders
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.template.loader import get_template
+from django.template.loader_tags import ExtendsNode, IncludeNode
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.text import get_valid_filename
 
-from calls.models import CallExcludedActivity, CallFreeCreditsRule
+from calls.models import CALL_DEFERRED_FIELDS, CallExcludedActivity, CallFreeCreditsRule
 
-from management.models import *
-from management.settings import VIEW_APPLICATIONS_OFFICE
+from generics.pdf import get_pdf_renderer, merge_pdf
+from generics.storage import link_or_copy
+from generics.utils import get_request_objects
 
-from organizational_area.models import OrganizationalStructureOfficeEmployee
+from management.models import *
+from management.roles import get_user_roles
 
 from pathlib import Path
-
-from weasyprint import CSS, HTML
+from urllib.parse import quote
 
 from . forms import InsertionFreeForm, InsertionRequiredForm
-from . models import ApplicationInsertionFree, ApplicationInsertionRequired
+from . models import Application, ApplicationInsertionFree, ApplicationInsertionRequired
 from . settings import (
+    DOWNLOAD_OFFLOAD,
+    DOWNLOAD_X_ACCEL_REDIRECT_PREFIX,
+    PDF_DOSSIER_VERSION,
+    PDF_INSERTIONS_SINGLE_DOCUMENT,
+    PDF_STYLESHEETS,
     PDF_TEMP_FOLDER_PATH,
     PDF_TEMP_FOLDER_ATTACHMENTS_PATH,
     PDF_TO_MERGE_TEMP_FOLDER_PATH
@@ -32,55 +43,245 @@ from . settings import (
 logger = logging.getLogger(__name__)
 
 
-def generate_application_pdf(application):
-    template = get_template('print/application.html')
-    context = {
-        'application': application,
-    }
-    html = template.render(context)
+# not rendered or tracked elsewhere, ignored in dossier inputs
+DOSSIER_IGNORED_FIELDS = ('modified', 'modified_by_id', 'protocol_taken', 'attachments_info')
+# the application pdf shows the last modification date
+APPLICATION_DOSSIER_IGNORED_FIELDS = ('modified_by_id', 'protocol_taken', 'attachments_info')
+DOSSIER_MANIFEST_VERSION = 1
+
+# templates they extend or include are tracked too
+APPLICATION_PDF_TEMPLATES = (
+    'print/application.html',
+)
+INSERTIONS_PDF_TEMPLATES = (
+    'print/application_insertions.html',
+    'print/application_required_form.html',
+    'print/application_free_form.html',
+)
 
-    application_folder_path = os.path.join(
+
+def _application_folder_path(application, *path):
+    return os.path.join(
         settings.MEDIA_ROOT,
-        f'{PDF_TEMP_FOLDER_PATH}/{application.pk}'
+        f'{PDF_TEMP_FOLDER_PATH}/{application.pk}',
+        *path
+    )
+
+
+def _inputs_hash(*values):
+    data = json.dumps(values, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _instance_values(instance, exclude=()):
+    return {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def _template_sources(template_name, sources):
+    """
+    Adds to sources the template source and the ones of the templates
+    it extends or includes, when their names are not variables
+    """
+    if template_name in sources: return
+    template = get_template(template_name).template
+    sources[template_name] = template.source
+    names = [node.parent_name.var for node in template.nodelist.get_nodes_by_type(ExtendsNode)]
+    names += [node.template.var for node in template.nodelist.get_nodes_by_type(IncludeNode)]
+    for name in names:
+        if isinstance(name, str):
+            _template_sources(name, sources)
+
+
+def _templates_hash(template_names):
+    sources = {}
+    for name in template_names:
+        _template_sources(name, sources)
+    return _inputs_hash(
+        PDF_DOSSIER_VERSION,
+        PDF_STYLESHEETS,
+        sources
+    )
+
+
+def get_insertion_sections(application):
+    """
+    Required and free insertions in print order,
+    with the hash of the data shown in their form
+    """
+    sections = []
+    insertions = application.applicationinsertionrequired_set.order_by('pk')
+    for insertion in insertions:
+        target_teaching = application.call.get_teaching_data(
+            insertion.target_teaching_id
+        )
+        sections.append({
+            'anchor': f'required-{insertion.pk}',
+            'insertion': insertion,
+            'target_teaching': target_teaching,
+            'inputs': _inputs_hash(
+                _instance_values(insertion, DOSSIER_IGNORED_FIELDS),
+                target_teaching
+            )
+        })
+    insertions = application.applicationinsertionfree_set.select_related('free_credits').order_by('pk')
+    for insertion in insertions:
+        sections.append({
+            'anchor': f'free-{insertion.pk}',
+            'insertion': insertion,
+            'free_credits_rule': insertion.free_credits,
+            'inputs': _inputs_hash(
+                _instance_values(insertion, DOSSIER_IGNORED_FIELDS),
+                _instance_values(insertion.free_credits, DOSSIER_IGNORED_FIELDS)
+            )
+        })
+    return sections
+
+
+def get_dossier_inputs(application, sections):
+    """
+    Hash of the inputs of each part of the application docs:
+    application pdf, uploaded files, insertion forms
+    """
+    call_values = _instance_values(
+        application.call,
+        (*CALL_DEFERRED_FIELDS, *DOSSIER_IGNORED_FIELDS)
     )
-    if os.path.isdir(application_folder_path):
-        shutil.rmtree(application_folder_path)
+    inputs = {
+        'application': _inputs_hash(
+            _templates_hash(APPLICATION_PDF_TEMPLATES),
+            _instance_values(application, APPLICATION_DOSSIER_IGNORED_FIELDS),
+            _instance_values(application.user, ('password', 'last_login')),
+            call_values
+        )
+    }
+    for field in application.get_attachment_fields():
+        info = application.get_attachment_info(field)
+        if info: inputs[f'attachment-{field}'] = info['sha256']
+
+    forms_templates = _templates_hash(INSERTIONS_PDF_TEMPLATES)
+    for section in sections:
+        inputs[section['anchor']] = _inputs_hash(
+            forms_templates,
+            call_values,
+            section['inputs']
+        )
+        info = section['insertion'].get_attachment_info('source_teaching_attachment')
+        inputs[f"{section['anchor']}-file"] = info['sha256']
+    return inputs
+
+
+def _legacy_file_prefix(section):
+    if 'free_credits_rule' in section:
+        return f'zfree-{section["insertion"].pk:03d}'
+    return f'required-{section["insertion"].pk:03d}'
+
+
+def get_dossier_files(application, sections):
+    """
+    Files generated for the application docs, all of them
+    must exist to reuse a previous generation
+    """
+    attachments_path = _application_folder_path(application, PDF_TEMP_FOLDER_ATTACHMENTS_PATH)
+    files = [
+        _application_folder_path(application, 'domanda.pdf'),
+        os.path.join(attachments_path, 'inserimenti.pdf')
+    ]
+    for attachment in application.get_filefield_attributes():
+        if getattr(application, attachment):
+            files.append(os.path.join(attachments_path, f'{attachment}.pdf'))
+
+    if PDF_INSERTIONS_SINGLE_DOCUMENT:
+        if sections: files.append(_application_folder_path(application, 'moduli.pdf'))
+        return files
+
+    merge_folder = _application_folder_path(application, PDF_TO_MERGE_TEMP_FOLDER_PATH)
+    for section in sections:
+        prefix = _legacy_file_prefix(section)
+        files.append(os.path.join(merge_folder, f'{prefix}-a.pdf'))
+        files.append(os.path.join(merge_folder, f'{prefix}-file.pdf'))
+    return files
+
+
+def read_dossier_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != DOSSIER_MANIFEST_VERSION: return {}
+    return manifest
+
 
+def write_dossier_manifest(path, manifest):
+    tmp_path = f'{path}.{os.getpid()}'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': DOSSIER_MANIFEST_VERSION, **manifest}, f)
+    os.replace(tmp_path, path)
+
+
+def generate_application_pdf(application):
+    application_folder_path = _application_folder_path(application)
     os.makedirs(application_folder_path, exist_ok=True)
     file_path = os.path.join(application_folder_path, 'domanda.pdf')
 
-    css_italia_path = finders.find('css/bootstrap-italia.min.css')  # percorso reale sul disco
-    css_italia = CSS(filename=css_italia_path)
-    # ~ css_unical_path = finders.find('css/unical-style.css')  # percorso reale sul disco
-    # ~ css_unical = CSS(filename=css_unical_path)
-    HTML(string=html).write_pdf(file_path, stylesheets=[css_italia]) #, css_unical])
+    get_pdf_renderer(PDF_STYLESHEETS).render(
+        'print/application.html',
+        {'application': application},
+        file_path
+    )
 
 
-def get_application_attachments(application):
+def get_application_attachments(application, changed=None):
     attachments = application.get_filefield_attributes()
     for attachment in attachments:
-        attachment_file = getattr(application, attachment)
-        if not attachment_file: continue
-
         folder_path = os.path.join(
             settings.MEDIA_ROOT,
             f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TEMP_FOLDER_ATTACHMENTS_PATH}'
         )
-        os.makedirs(folder_path, exist_ok=True)
-
-        attachment_source = getattr(application, attachment).path
         attachment_destination = os.path.join(
             folder_path,
             f'{attachment}.pdf'
         )
-        shutil.copyfile(attachment_source, attachment_destination)
+
+        attachment_file = getattr(application, attachment)
+        if not attachment_file:
+            # removed since the last generation
+            if os.path.exists(attachment_destination):
+                os.remove(attachment_destination)
+            continue
+
+        if changed and not changed(f'attachment-{attachment}') and os.path.exists(attachment_destination):
+            continue
+
+        os.makedirs(folder_path, exist_ok=True)
+
+        attachment_source = getattr(application, attachment).path
+        link_or_copy(attachment_source, attachment_destination)
 
 
-def generate_required_insertion_pdf(application):
-    css_italia_path = finders.find('css/bootstrap-italia.min.css')  # percorso reale sul disco
-    css_italia = CSS(filename=css_italia_path)
+def generate_required_insertion_pdf(application, changed=None):
+    renderer = get_pdf_renderer(PDF_STYLESHEETS)
 
     for insertion in application.applicationinsertionrequired_set.all():
+        folder_path = os.path.join(
+            settings.MEDIA_ROOT,
+            f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TO_MERGE_TEMP_FOLDER_PATH}'
+        )
+        file_path = os.path.join(folder_path, f'required-{insertion.pk:03d}-a.pdf')
+        attachment_destination = os.path.join(
+            folder_path,
+            f'required-{insertion.pk:03d}-file.pdf'
+        )
+        if changed and not (
+            changed(f'required-{insertion.pk}') or
+            changed(f'required-{insertion.pk}-file')
+        ) and os.path.exists(file_path) and os.path.exists(attachment_destination):
+            continue
+
         target_teaching = application.call.get_teaching_data(
             insertion.target_teaching_id
         )
@@ -90,150 +291,234 @@ def generate_required_insertion_pdf(application):
             application=application
         )
 
-        template = get_template('print/application_required_form.html')
         context = {
             'application': application,
             'form': form,
             'target_teaching': target_teaching
         }
-        html = template.render(context)
 
+        os.makedirs(folder_path, exist_ok=True)
+        renderer.render('print/application_required_form.html', context, file_path)
+
+        attachment_source = insertion.source_teaching_attachment.path
+        link_or_copy(attachment_source, attachment_destination)
+
+
+def generate_free_insertion_pdf(application, changed=None):
+    renderer = get_pdf_renderer(PDF_STYLESHEETS)
+
+    for insertion in application.applicationinsertionfree_set.all():
         folder_path = os.path.join(
             settings.MEDIA_ROOT,
             f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TO_MERGE_TEMP_FOLDER_PATH}'
         )
-        os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, f'required-{insertion.pk:03d}-a.pdf')
-
-        HTML(string=html).write_pdf(file_path, stylesheets=[css_italia])
-
-        attachment_source = insertion.source_teaching_attachment.path
+        file_path = os.path.join(folder_path, f'zfree-{insertion.pk:03d}-a.pdf')
         attachment_destination = os.path.join(
             folder_path,
-            f'required-{insertion.pk:03d}-file.pdf'
+            f'zfree-{insertion.pk:03d}-file.pdf'
         )
-        shutil.copyfile(attachment_source, attachment_destination)
-
+        if changed and not (
+            changed(f'free-{insertion.pk}') or
+            changed(f'free-{insertion.pk}-file')
+        ) and os.path.exists(file_path) and os.path.exists(attachment_destination):
+            continue
 
-def generate_free_insertion_pdf(application):
-    css_italia_path = finders.find('css/bootstrap-italia.min.css')  # percorso reale sul disco
-    css_italia = CSS(filename=css_italia_path)
-
-    for insertion in application.applicationinsertionfree_set.all():
         form = InsertionFreeForm(
             instance=insertion,
             application=application,
             free_credits_rule=insertion.free_credits
         )
-        template = get_template('print/application_free_form.html')
         context = {
             'free_credits_rule': insertion.free_credits,
             'application': application,
             'form': form
         }
-        html = template.render(context)
 
-        folder_path = os.path.join(
-            settings.MEDIA_ROOT,
-            f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TO_MERGE_TEMP_FOLDER_PATH}'
-        )
         os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, f'zfree-{insertion.pk:03d}-a.pdf')
-
-        HTML(string=html).write_pdf(file_path, stylesheets=[css_italia])
+        renderer.render('print/application_free_form.html', context, file_path)
 
         attachment_source = insertion.source_teaching_attachment.path
-        attachment_destination = os.path.join(
-            folder_path,
-            f'zfree-{insertion.pk:03d}-file.pdf'
-        )
-        shutil.copyfile(attachment_source, attachment_destination)
-
-
-def generate_application_docs(application):
-    generate_application_pdf(application)
-    get_application_attachments(application)
-    generate_required_insertion_pdf(application)
-    generate_free_insertion_pdf(application)
+        link_or_copy(attachment_source, attachment_destination)
+
+
+def generate_insertions_pdf(application, sections):
+    """
+    Renders the forms of all the insertions in one document,
+    a section per insertion. Returns the first page of each section
+    """
+    for section in sections:
+        if 'free_credits_rule' in section:
+            section['form'] = InsertionFreeForm(
+                instance=section['insertion'],
+                application=application,
+                free_credits_rule=section['free_credits_rule']
+            )
+        else:
+            section['form'] = InsertionRequiredForm(
+                target_teaching=section['target_teaching'],
+                instance=section['insertion'],
+                application=application
+            )
+
+    pages = get_pdf_renderer(PDF_STYLESHEETS).render_sections(
+        'print/application_insertions.html',
+        {'application': application, 'sections': sections},
+        _application_folder_path(application, 'moduli.pdf')
+    )
+    return {section['anchor']: pages[section['anchor']] for section in sections}
+
+
+def generate_application_docs(application, sections, changed=None, forms_pages=None):
+    """
+    Generates the application docs, only the parts whose inputs
+    changed if changed(part) is given. Returns the pdf files to merge,
+    as (path, pages range or None), and the first page of each
+    insertion form in the single document
+    """
+    if not changed or changed('application') or not os.path.exists(_application_folder_path(application, 'domanda.pdf')):
+        generate_application_pdf(application)
+    get_application_attachments(application, changed)
+
+    if PDF_INSERTIONS_SINGLE_DOCUMENT:
+        if not sections: return [], {}
+        file_path = _application_folder_path(application, 'moduli.pdf')
+        anchors = [section['anchor'] for section in sections]
+        if (
+            not changed or
+            not forms_pages or
+            set(forms_pages) != set(anchors) or
+            any(changed(anchor) for anchor in anchors) or
+            not os.path.exists(file_path)
+        ):
+            forms_pages = generate_insertions_pdf(application, sections)
+
+        # form pages followed by the uploaded attachment
+        to_merge = []
+        starts = [forms_pages[anchor] for anchor in anchors]
+        ends = starts[1:] + [None]
+        for section, start, end in zip(sections, starts, ends):
+            to_merge.append((file_path, (start, end)))
+            to_merge.append((section['insertion'].source_teaching_attachment.path, None))
+        return to_merge, forms_pages
+
+    generate_required_insertion_pdf(application, changed)
+    generate_free_insertion_pdf(application, changed)
+    merge_folder = os.path.join(
+        settings.MEDIA_ROOT,
+        f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TO_MERGE_TEMP_FOLDER_PATH}'
+    )
+    # files of deleted insertions
+    current = {_legacy_file_prefix(section) for section in sections}
+    for pdf_file in Path(merge_folder).glob('*.pdf'):
+        if pdf_file.name.rsplit('-', 1)[0] not in current:
+            pdf_file.unlink()
+    # in print order, names sort differently from 1000 on
+    to_merge = []
+    for section in sections:
+        prefix = _legacy_file_prefix(section)
+        to_merge.append((Path(merge_folder) / f'{prefix}-a.pdf', None))
+        to_merge.append((Path(merge_folder) / f'{prefix}-file.pdf', None))
+    return to_merge, None
 
 
 def generate_application_merged_docs(application):
+    """
+    Generates the docs to register, rebuilding only the parts whose
+    inputs changed since the last generation (see manifest.json)
+    """
     attachments_path = os.path.join(
         settings.MEDIA_ROOT,
         f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TEMP_FOLDER_ATTACHMENTS_PATH}'
     )
-
-    if os.path.isdir(attachments_path):
-        return True
+    output_path = os.path.join(
+        attachments_path,
+        f'inserimenti.pdf'
+    )
+    manifest_path = _application_folder_path(application, 'manifest.json')
 
     try:
-        generate_application_docs(application)
-        merge_folder = os.path.join(
-            settings.MEDIA_ROOT,
-            f'{PDF_TEMP_FOLDER_PATH}/{application.pk}/{PDF_TO_MERGE_TEMP_FOLDER_PATH}'
-        )
-        pdfWriter = pypdf.PdfWriter()
-        # Filtra solo i file .pdf nella cartella
-        pdf_files = sorted(Path(merge_folder).glob('*.pdf'))
-        for pdf_file in pdf_files:
-            with open(pdf_file, 'rb') as pdfFileObj:
-                pdfReader = pypdf.PdfReader(pdfFileObj)
-                for page in pdfReader.pages:
-                    pdfWriter.add_page(page)
+        sections = get_insertion_sections(application)
+        inputs = get_dossier_inputs(application, sections)
+        manifest = read_dossier_manifest(manifest_path)
+        if manifest.get('inputs') == inputs and all(
+            os.path.exists(path) for path in get_dossier_files(application, sections)
+        ):
+            return True
+
+        previous = manifest.get('inputs', {})
+        # an interrupted generation must not look complete
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
 
+        to_merge, forms_pages = generate_application_docs(
+            application,
+            sections,
+            changed=lambda part: previous.get(part) != inputs.get(part),
+            forms_pages=manifest.get('forms_pages')
+        )
         os.makedirs(attachments_path, exist_ok=True)
+        pages, size = merge_pdf(to_merge, output_path)
+        logger.info(f'[{application.pk}] {output_path}: {pages} pages, {size} bytes')
 
-        output_path = os.path.join(
-            attachments_path,
-            f'inserimenti.pdf'
+        write_dossier_manifest(
+            manifest_path,
+            {'inputs': inputs, 'forms_pages': forms_pages}
         )
-        with open(output_path, 'wb') as pdfOutput:
-            pdfWriter.write(pdfOutput)
         return True
     except Exception as e:
         logger.exception(e)
         return False
 
 
-def get_application_required_insertions_data(application, show_commission_review=False):
-    insertions = application.applicationinsertionrequired_set.all()
+def get_excluded_codes(request, call):
+    """
+    Excluded activities codes of the call, loaded once per request
+    """
+    objects = get_request_objects(request)
+    if objects.excluded_codes is None:
+        objects.excluded_codes = set(
+            CallExcludedActivity.objects.filter(
+                call=call,
+                is_active=True
+            ).values_list('code', flat=True)
+        )
+    return objects.excluded_codes
 
-    codes_to_exclude = CallExcludedActivity.objects.filter(
-        call=application.call,
-        is_active=True
-    ).values_list('code', flat=True)
 
-    codes_list = insertions.values_list('target_teaching_id', flat=True)
+def get_application_required_insertions_data(application, codes_to_exclude, show_commission_review=False):
+    insertions = application.applicationinsertionrequired_set.select_related('review')
 
+    # one pass on insertions joined with reviews
+    codes_list = set()
     declared_credits = {}
     for insertion in insertions:
-        if not declared_credits.get(insertion.target_teaching_id):
+        codes_list.add(insertion.target_teaching_id)
+        review = getattr(insertion, 'review', None)
+        review_credits = review.changed_credits if review else None
+
+        if insertion.target_teaching_id not in declared_credits:
             declared_credits[insertion.target_teaching_id] = [
                 insertion.source_teaching_credits,
                 insertion.source_teaching_credits >= insertion.target_teaching_credits,
-                # ~ insertion.review.changed_credits if hasattr(insertion, 'review') else insertion.source_teaching_credits,
-                insertion.review.changed_credits if hasattr(insertion, 'review') else None,
-                # ~ insertion.review.changed_credits >= insertion.target_teaching_credits if hasattr(insertion, 'review') else insertion.source_teaching_credits >= insertion.target_teaching_credits,
-                insertion.review.changed_credits >= insertion.target_teaching_credits if hasattr(insertion, 'review') else None,
-            ]
-        else:
-            tot = declared_credits[insertion.target_teaching_id][0] + insertion.source_teaching_credits
-            # ~ tot_review = declared_credits[insertion.target_teaching_id][2] + (insertion.review.changed_credits if hasattr(insertion, 'review') else insertion.source_teaching_credits)
-            tot_review = declared_credits[insertion.target_teaching_id][2]
-            insertion_review_changed_credits = insertion.review.changed_credits if hasattr(insertion, 'review') else None
-            tot_review_item = None
-            if tot_review != None and insertion_review_changed_credits != None:
-                tot_review_item = tot_review + insertion_review_changed_credits
-            elif tot_review != None and insertion_review_changed_credits == None:
-                tot_review_item = tot_review
-            elif tot_review == None and insertion_review_changed_credits != None:
-                tot_review_item = insertion_review_changed_credits
-            declared_credits[insertion.target_teaching_id] = [
-                tot,
-                tot >= insertion.target_teaching_credits,
-                tot_review_item,
-                tot_review_item >= insertion.target_teaching_credits if tot_review_item else None
+                review_credits,
+                review_credits >= insertion.target_teaching_credits if review else None,
             ]
+            continue
+
+        tot = declared_credits[insertion.target_teaching_id][0] + insertion.source_teaching_credits
+        tot_review = declared_credits[insertion.target_teaching_id][2]
+        if tot_review is None:
+            tot_review = review_credits
+        elif review_credits is not None:
+            tot_review += review_credits
+        declared_credits[insertion.target_teaching_id] = [
+            tot,
+            tot >= insertion.target_teaching_credits,
+            tot_review,
+            tot_review >= insertion.target_teaching_credits if tot_review else None
+        ]
+
+    # memoized, from credits summary
     tot_credits = application.get_credits_status(show_commission_review)
     return {
         'codes_to_exclude': codes_to_exclude,
@@ -268,22 +553,225 @@ def has_permission_to_download(user, application):
         return True
     elif user.is_superuser and application.submission_date:
         return True
-    elif application.call.course_json_it.get('DepartmentCod', '') and application.submission_date:
-        is_employee = OrganizationalStructureOfficeEmployee.objects.filter(
-            office__organizational_structure__unique_code=application.call.course_json_it['DepartmentCod'],
-            office__organizational_structure__is_active=True,
-            office__name=VIEW_APPLICATIONS_OFFICE,
-            office__is_active=True,
-            employee=user
-        ).exists()
-        if is_employee:
-            return True
-    if CallCommission.objects.filter(
-        call__pk=application.call_id,
-        call__is_active=True,
-        is_active=True,
-        callcommissionmember__user=user,
-        callcommissionmember__is_active=True
-    ).exists():
+
+    roles = get_user_roles(user)
+    department_cod = application.call.department_cod
+    if department_cod and application.submission_date and department_cod in roles['structures'].values():
+        return True
+    if application.call.is_active and application.call_id in roles['commissions']:
         return True
     return False
+
+
+def has_permission_to_download_call(user, call):
+    """
+    Same rules of has_permission_to_download,
+    for all the submitted applications of the call
+    """
+    if user.is_superuser:
+        return True
+
+    roles = get_user_roles(user)
+    if call.department_cod and call.department_cod in roles['structures'].values():
+        return True
+    if call.is_active and call.pk in roles['commissions']:
+        return True
+    return False
+
+
+def get_call_attachments(call):
+    """
+    Yields (path in the archive, file path) of the attachments
+    of the submitted applications of the call, a folder per candidate
+    """
+    applications = (
+        Application.objects
+        .filter(call=call, submission_date__isnull=False)
+        .select_related('user')
+        .prefetch_related(
+            'applicationinsertionrequired_set',
+            'applicationinsertionfree_set__free_credits'
+        )
+        .order_by('user__last_name', 'user__first_name', 'pk')
+    )
+    for application in applications.iterator(chunk_size=100):
+        user = application.user
+        folder = get_valid_filename(f'{user.last_name} {user.first_name} {user.taxpayer_id}')
+        for field in application.get_filefield_attributes():
+            attachment = getattr(application, field)
+            if not attachment: continue
+            yield f'{folder}/{field}{os.path.splitext(attachment.name)[1]}', attachment.path
+        for insertion in application.applicationinsertionrequired_set.all():
+            attachment = insertion.source_teaching_attachment
+            yield (
+                f'{folder}/obbligatori/{insertion.target_teaching_year}-anno/'
+                f'{insertion.pk}-{os.path.basename(attachment.name)}',
+                attachment.path
+            )
+        for insertion in application.applicationinsertionfree_set.all():
+            attachment = insertion.source_teaching_attachment
+            yield (
+                f'{folder}/scelta/{insertion.free_credits.course_year}-anno/'
+                f'{insertion.pk}-{os.path.basename(attachment.name)}',
+                attachment.path
+            )
+
+
+class _ZipStream:
+    """
+    Not seekable file-like object that keeps only
+    the bytes written since the last read
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def read(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def call_attachments_zip(call, chunk_size=64 * 1024):
+    """
+    Yields the ZIP (stored, not compressed) of the call attachments
+    while it's built, without temporary files
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in get_call_attachments(call):
+            if not os.path.exists(path):
+                logger.warning(f"[call {call.pk}] {path} not found, skipped")
+                continue
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            with open(path, 'rb') as source, archive.open(info, mode='w') as dest:
+                while True:
+                    data = source.read(chunk_size)
+                    if not data: break
+                    dest.write(data)
+                    yield stream.read()
+            yield stream.read()
+    # central directory
+    yield stream.read()
+
+
+def call_attachments_response(call):
+    response = StreamingHttpResponse(
+        call_attachments_zip(call),
+        content_type='application/zip'
+    )
+    response["Content-Disposition"] = f"attachment; filename=bando-{call.pk}-allegati.zip"
+    return response
+
+
+def _parse_range_header(range_header, size):
+    """
+    Returns (start, end) of a single bytes range, None if the header
+    can't be used and False if the range is not satisfiable
+    """
+    if not range_header.startswith('bytes='): return None
+    ranges = range_header[6:].split(',')
+    # multiple ranges not supported, full content is served
+    if len(ranges) != 1: return None
+    start, sep, end = ranges[0].strip().partition('-')
+    if not sep: return None
+    try:
+        if not start:
+            # suffix range, last n bytes
+            length = int(end)
+            if length <= 0: return False
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start: return False
+    return start, min(end, size - 1)
+
+
+def _file_range_iterator(path, start, length, chunk_size=64 * 1024):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data: break
+            length -= len(data)
+            yield data
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def attachment_response(request, path, content_type, sha256=None):
+    """
+    Streams the file with FileResponse or, if DOWNLOAD_OFFLOAD is set,
+    delegates it to the web server with X-Accel-Redirect/X-Sendfile.
+    Supports conditional requests (ETag/Last-Modified) and single
+    byte ranges. The ETag is the content sha256, if known,
+    size and modification time otherwise
+    """
+    stat = os.stat(path)
+    if sha256:
+        etag = f'"{sha256}"'
+    else:
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if response is not None:
+        return _set_validators(response, etag, last_modified)
+
+    if DOWNLOAD_OFFLOAD == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        relative_path = os.path.relpath(path, settings.MEDIA_ROOT)
+        response['X-Accel-Redirect'] = f'{DOWNLOAD_X_ACCEL_REDIRECT_PREFIX}{quote(relative_path)}'
+    elif DOWNLOAD_OFFLOAD == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        range_header = request.headers.get('Range', '')
+        if_range = request.headers.get('If-Range', '')
+        # If-Range: partial content only if the file is unchanged
+        if range_header and (not if_range or if_range in (etag, http_date(last_modified))):
+            byte_range = _parse_range_header(range_header, stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return _set_validators(response, etag, last_modified)
+
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _file_range_iterator(path, start, end - start + 1),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    _set_validators(response, etag, last_modified)
+    response["Content-Disposition"] = "inline; filename=" + os.path.basename(path)
+    return response
@@ -1,5 +1,4 @@
 import logging
-import magic
 import os
 import pypdf
 import shutil
@@ -46,11 +45,7 @@ def applications(request):
 @login_required
 @application_check
 def application(request, application_pk, template='application.html', application=None):
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     tot_credits = application.get_credits_status(show_commission_review)
 
@@ -357,14 +352,11 @@ def application_delete(request, application_pk, application=None):
 @login_required
 @application_check
 def application_required_list(request, application_pk, application=None):
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     application_data = get_application_required_insertions_data(
         application=application,
+        codes_to_exclude=get_excluded_codes(request, application.call),
         show_commission_review=show_commission_review
     )
 
@@ -559,11 +551,7 @@ def application_required_delete(request, application_pk, insertion_pk, applicati
 @login_required
 @application_check
 def application_free(request, application_pk, year, application=None):
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     data = get_application_free_insertions_data(
         application=application,
@@ -744,36 +732,28 @@ def application_free_delete(request, application_pk, insertion_pk, application=N
     )
 
 
-def download_attachment(user, application_pk, field=''):
+def download_attachment(request, application_pk, field=''):
     application = get_object_or_404(
         Application,
         pk=application_pk
     )
 
-    permission = has_permission_to_download(user, application)
+    permission = has_permission_to_download(request.user, application)
     if not permission: raise Http404
 
-    mime = magic.Magic(mime=True)
-    field = getattr(application, field, None)
-    if not field:
-        return None
-    path = field.path
-    content_type = mime.from_file(path)
-
-    if os.path.exists(path):
-        with open(path, "rb") as fh:
-            response = HttpResponse(fh.read(), content_type=content_type)
-            response["Content-Disposition"] = "inline; filename=" + os.path.basename(
-                path
-            )
-            return response
-    return None
+    attachment = getattr(application, field, None)
+    if not attachment: raise Http404
+    path = attachment.path
+    if not os.path.exists(path): raise Http404
+
+    info = application.get_attachment_info(field)
+    return attachment_response(request, path, info['content_type'], info.get('sha256'))
 
 
 @login_required
 def download_exams_certificate(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='home_exams_certification'
     )
@@ -782,7 +762,7 @@ def download_exams_certificate(request, application_pk):
 @login_required
 def download_teaching_plan(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='home_teaching_plan'
     )
@@ -791,7 +771,7 @@ def download_teaching_plan(request, application_pk):
 @login_required
 def download_votes_conversion(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='home_votes_conversion'
     )
@@ -800,7 +780,7 @@ def download_votes_conversion(request, application_pk):
 @login_required
 def download_language_certification(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='home_language_certification'
     )
@@ -809,7 +789,7 @@ def download_language_certification(request, application_pk):
 @login_required
 def download_payment_receipt(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='payment_receipt'
     )
@@ -818,7 +798,7 @@ def download_payment_receipt(request, application_pk):
 @login_required
 def download_declaration_of_value(request, application_pk):
     return download_attachment(
-        user=request.user,
+        request=request,
         application_pk=application_pk,
         field='declaration_of_value'
     )
@@ -830,7 +810,7 @@ def download_insertion_attachment(request, application_pk, insertion_pk):
 
     permission = has_permission_to_download(request.user, application)
 
-    if not permission: Http404
+    if not permission: raise Http404
 
     insertion = ApplicationInsertionRequired.objects.filter(
         application__pk=application_pk,
@@ -845,15 +825,8 @@ def download_insertion_attachment(request, application_pk, insertion_pk):
 
     if not insertion: raise Http404
 
-    mime = magic.Magic(mime=True)
     path = insertion.source_teaching_attachment.path
-    content_type = mime.from_file(path)
+    if not os.path.exists(path): raise Http404
 
-    if os.path.exists(path):
-        with open(path, "rb") as fh:
-            response = HttpResponse(fh.read(), content_type=content_type)
-            response["Content-Disposition"] = "inline; filename=" + os.path.basename(
-                path
-            )
-            return response
-    return None
+    info = insertion.get_attachment_info('source_teaching_attachment')
+    return attachment_response(request, path, info['content_type'], info.get('sha256'))
@@ -67,6 +67,7 @@ class CallAdmin(admin.ModelAdmin):
     )
     list_editable = ('is_active', 'ordering')
     readonly_fields = (
+        'department_cod',
         'course_json_it',
         'course_json_en',
         'course_studyplan_json_it_trunked',
@@ -81,6 +82,12 @@ class CallAdmin(admin.ModelAdmin):
         CallCommissionInline,
     ]
 
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        # changelist doesn't need them, change form does
+        if obj: obj.load_deferred_fields()
+        return obj
+
     def course_studyplan_json_it_trunked(self, obj):
         text = str(obj.course_studyplans_json_it) or ""
         if len(text) > 1000:
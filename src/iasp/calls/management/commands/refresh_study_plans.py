@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... models import Call
+from ... utils import build_teachings_index, fetch_course_data
+
+
+logger = logging.getLogger(__name__)
+
+
+JSON_FIELDS = {
+    'course_it': 'course_json_it',
+    'course_en': 'course_json_en',
+    'studyplans_it': 'course_studyplans_json_it',
+    'studyplans_en': 'course_studyplans_json_en',
+}
+
+
+def json_hash(value):
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def teachings_diff(call, old_plans, new_plans):
+    old = build_teachings_index(old_plans, call.study_plan_cod)
+    new = build_teachings_index(new_plans, call.study_plan_cod)
+    added = [new[k] for k in new if k not in old]
+    removed = [old[k] for k in old if k not in new]
+    changed = [
+        (old[k], new[k]) for k in new
+        if k in old and old[k]['credits'] != new[k]['credits']
+    ]
+    return added, removed, changed
+
+
+class Command(BaseCommand):
+    help = 'IASP - refresh CdS and study plans data of all active calls'
+
+    def add_arguments(self, parser):
+        parser.epilog = 'Example: ./manage.py refresh_study_plans --workers 8'
+        parser.add_argument('--workers', type=int, default=4,
+                            help="max number of calls fetched in parallel")
+        parser.add_argument('--dry-run', required=False, action="store_true",
+                            help="show changes without saving them")
+
+    def handle(self, *args, **options):
+        calls = Call.objects.with_study_plans().filter(is_active=True)
+
+        def fetch(call):
+            # max_age=0: always revalidate cached responses
+            return call, fetch_course_data(
+                course_cod=call.course_cod,
+                course_cohort=call.course_cohort,
+                max_age=0
+            )
+
+        with ThreadPoolExecutor(max_workers=max(options['workers'], 1)) as executor:
+            for call, data in executor.map(fetch, calls):
+                changed_fields = []
+                for key, field in JSON_FIELDS.items():
+                    if data.get(key) is None:
+                        print(f'[{call.pk}] {call} - {key} fetch FAILED, stored data kept')
+                        continue
+                    if json_hash(data[key]) != json_hash(getattr(call, field)):
+                        changed_fields.append(field)
+
+                if not changed_fields:
+                    print(f'[{call.pk}] {call} - unchanged')
+                    continue
+
+                print(f'[{call.pk}] {call} - changed: {", ".join(changed_fields)}')
+                for lang in ('it', 'en'):
+                    field = f'course_studyplans_json_{lang}'
+                    if field not in changed_fields: continue
+                    added, removed, changed = teachings_diff(
+                        call,
+                        getattr(call, field),
+                        data[f'studyplans_{lang}']
+                    )
+                    for teaching in added:
+                        print(f'    [{lang}] + {teaching["cod"]} - {teaching["name"]} ({teaching["credits"]} CFU)')
+                    for teaching in removed:
+                        print(f'    [{lang}] - {teaching["cod"]} - {teaching["name"]} ({teaching["credits"]} CFU)')
+                    for old, new in changed:
+                        print(f'    [{lang}] * {new["cod"]} - {new["name"]} ({old["credits"]} -> {new["credits"]} CFU)')
+
+                if options['dry_run']: continue
+
+                for key, field in JSON_FIELDS.items():
+                    if field in changed_fields:
+                        setattr(call, field, data[key])
+                update_fields = changed_fields + ['modified']
+                if 'course_json_it' in changed_fields:
+                    update_fields.append('department_cod')
+                with transaction.atomic():
+                    call.save(update_fields=update_fields)
+                    if 'course_studyplans_json_it' in changed_fields or 'course_studyplans_json_en' in changed_fields:
+                        call.rebuild_teachings()
+
+                logger.info(f'[{call.pk}] {call} study plans data refreshed: {", ".join(changed_fields)}')
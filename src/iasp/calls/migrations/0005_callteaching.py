@@ -0,0 +1,219 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:19
+
+import django.db.models.deletion
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def _to_decimal(value):
+    if value is None or value == "":
+        return None
+    return Decimal(str(value))
+
+
+def _join_ssd(value):
+    if isinstance(value, list):
+        return ", ".join(value)
+    return value or ""
+
+
+def materialize_teachings(call, lang, plans, CallTeaching, CallTeachingModule):
+    # copy of calls.utils.materialize_teachings as of this migration,
+    # historical models only
+    if not plans:
+        return
+
+    teachings = []
+    modules = {}
+    for plan in plans[0]["PlanTabs"]:
+        if plan["PlanTabCod"].upper() != call.study_plan_cod.upper():
+            continue
+        for rule in plan["Rules"]:
+            for teaching in rule["Required"]:
+                ordering = len(teachings)
+                teachings.append(
+                    CallTeaching(
+                        call_id=call.pk,
+                        lang=lang,
+                        ordering=ordering,
+                        activity_id=teaching["AfId"],
+                        cod=teaching["AfCod"] or "",
+                        name=teaching["AfDescription"] or "",
+                        credits=_to_decimal(teaching["CreditValue"]),
+                        ssd=_join_ssd(teaching["SettCod"]),
+                        year=rule["Year"],
+                    )
+                )
+                modules[ordering] = [
+                    CallTeachingModule(
+                        call_id=call.pk,
+                        lang=lang,
+                        ordering=module_ordering,
+                        activity_id=module["StudyActivityID"],
+                        cod=module["StudyActivityCod"] or "",
+                        name=module["StudyActivityName"] or "",
+                        partition_cod=module.get("studyActivityPartitionCod") or "",
+                        credits=_to_decimal(module["StudyActivityCreditValue"]),
+                        ssd=module["StudyActivitySettCod"] or "",
+                        year=rule["Year"],
+                    )
+                    for module_ordering, module in enumerate(teaching["AfSubModules"])
+                ]
+
+    CallTeaching.objects.bulk_create(teachings)
+
+    teaching_pks = dict(
+        CallTeaching.objects.filter(call_id=call.pk, lang=lang).values_list(
+            "ordering", "pk"
+        )
+    )
+    to_create = []
+    for ordering, teaching_modules in modules.items():
+        for module in teaching_modules:
+            module.teaching_id = teaching_pks[ordering]
+            to_create.append(module)
+    CallTeachingModule.objects.bulk_create(to_create)
+
+
+def populate_teachings(apps, schema_editor):
+    Call = apps.get_model("calls", "Call")
+    CallTeaching = apps.get_model("calls", "CallTeaching")
+    CallTeachingModule = apps.get_model("calls", "CallTeachingModule")
+    for call in Call.objects.all():
+        for lang, plans in (
+            ("it", call.course_studyplans_json_it),
+            ("en", call.course_studyplans_json_en),
+        ):
+            materialize_teachings(call, lang, plans, CallTeaching, CallTeachingModule)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calls", "0004_call_insertions_only_from_same_course"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CallTeaching",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lang", models.CharField(default="it", max_length=2)),
+                ("ordering", models.PositiveIntegerField(default=0)),
+                ("activity_id", models.IntegerField(blank=True, null=True)),
+                ("cod", models.CharField(blank=True, default="", max_length=255)),
+                ("name", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "credits",
+                    models.DecimalField(
+                        blank=True, decimal_places=1, max_digits=4, null=True
+                    ),
+                ),
+                ("ssd", models.CharField(blank=True, default="", max_length=255)),
+                ("year", models.PositiveIntegerField()),
+                (
+                    "call",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="teachings",
+                        to="calls.call",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("call", "lang", "ordering"),
+            },
+        ),
+        migrations.CreateModel(
+            name="CallTeachingModule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("lang", models.CharField(default="it", max_length=2)),
+                ("ordering", models.PositiveIntegerField(default=0)),
+                ("activity_id", models.IntegerField(blank=True, null=True)),
+                ("cod", models.CharField(blank=True, default="", max_length=255)),
+                ("name", models.CharField(blank=True, default="", max_length=255)),
+                (
+                    "partition_cod",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                (
+                    "credits",
+                    models.DecimalField(
+                        blank=True, decimal_places=1, max_digits=4, null=True
+                    ),
+                ),
+                ("ssd", models.CharField(blank=True, default="", max_length=255)),
+                ("year", models.PositiveIntegerField()),
+                (
+                    "call",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="teaching_modules",
+                        to="calls.call",
+                    ),
+                ),
+                (
+                    "teaching",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="modules",
+                        to="calls.callteaching",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("teaching", "ordering"),
+            },
+        ),
+        migrations.AddIndex(
+            model_name="callteaching",
+            index=models.Index(
+                fields=["call", "lang", "activity_id"],
+                name="calls_callt_call_id_08ca7a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callteaching",
+            index=models.Index(
+                fields=["call", "lang", "year"], name="calls_callt_call_id_9dc7e6_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callteaching",
+            index=models.Index(
+                fields=["call", "cod"], name="calls_callt_call_id_644462_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callteachingmodule",
+            index=models.Index(
+                fields=["call", "lang", "activity_id"],
+                name="calls_callt_call_id_939c1c_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="callteachingmodule",
+            index=models.Index(
+                fields=["call", "cod"], name="calls_callt_call_id_7f87f3_idx"
+            ),
+        ),
+        migrations.RunPython(populate_teachings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calls", "0005_callteaching"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="call",
+            options={"base_manager_name": "objects", "ordering": ("ordering",)},
+        ),
+    ]
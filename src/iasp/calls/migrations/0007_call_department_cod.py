@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+def populate_department_cod(apps, schema_editor):
+    Call = apps.get_model("calls", "Call")
+    for call in Call.objects.only("pk", "course_json_it"):
+        department_cod = (call.course_json_it or {}).get("DepartmentCod", "") or ""
+        if department_cod:
+            Call.objects.filter(pk=call.pk).update(department_cod=department_cod)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("calls", "0006_call_base_manager"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="call",
+            name="department_cod",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=255
+            ),
+        ),
+        migrations.RunPython(populate_department_cod, migrations.RunPython.noop),
+    ]
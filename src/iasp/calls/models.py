@@ -1,17 +1,17 @@
-import requests
 import sys
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator, ValidationError
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from generics.models import *
+from generics.utils import memoized
 
 from titulus_ws import settings as titulus_settings
 from titulus_ws.models import TitulusConfiguration
 
-from . settings import STORAGE_API_CDS, STORAGE_API_CDS_STUDYPLANS
+from . utils import fetch_course_data, materialize_teachings
 
 
 _protocol_titolario_list = titulus_settings.TITOLARIO_DICT
@@ -21,8 +21,31 @@ if 'makemigrations' in sys.argv or 'migrate' in sys.argv: # pragma: no cover
     _protocol_uo_list = [('', '-')]
 
 
+# heavy JSON columns, not loaded by default
+CALL_DEFERRED_FIELDS = (
+    'course_json_en',
+    'course_studyplans_json_it',
+    'course_studyplans_json_en',
+)
 
-class Call(ActivableModel, CreatedModifiedBy, TimeStampedModel):
+
+class CallQuerySet(models.QuerySet):
+    def with_course_data(self):
+        return self.defer(None).defer(
+            'course_studyplans_json_it',
+            'course_studyplans_json_en'
+        )
+
+    def with_study_plans(self):
+        return self.defer(None)
+
+
+class CallManager(models.Manager.from_queryset(CallQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer(*CALL_DEFERRED_FIELDS)
+
+
+class Call(ActivableModel, CreatedModifiedBy, TimeStampedModel, MemoizedModel):
     title_it = models.CharField(max_length=255)
     title_en = models.CharField(max_length=255)
     course_cod = models.CharField(max_length=10)
@@ -54,44 +77,123 @@ class Call(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     course_json_en = models.JSONField(blank=True, null=True)
     course_studyplans_json_it = models.JSONField(blank=True, null=True)
     course_studyplans_json_en = models.JSONField(blank=True, null=True)
+    # from course_json_it, to filter calls by structure
+    department_cod = models.CharField(max_length=255, blank=True, default='', db_index=True)
     ordering = models.IntegerField(default=10)
 
+    objects = CallManager()
+
     class Meta:
         ordering = ('ordering',)
+        # related object access (application.call) defers JSON too
+        base_manager_name = 'objects'
 
     def __str__(self):
         return f'{self.title_it}'
 
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # default queryset defers fields, Django would load all of them
+        # instead of the requested ones
+        if from_queryset is None:
+            from_queryset = Call.objects.with_study_plans()
+            if using: from_queryset = from_queryset.using(using)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+    def load_deferred_fields(self, *fields):
+        """
+        Loads deferred JSON fields with a single query
+        """
+        deferred = self.get_deferred_fields()
+        to_load = [f for f in (fields or CALL_DEFERRED_FIELDS) if f in deferred]
+        if to_load: self.refresh_from_db(fields=to_load)
+
+    def get_course_data(self, lang="it"):
+        if lang == "en":
+            self.load_deferred_fields('course_json_en')
+            return self.course_json_en
+        return self.course_json_it
+
+    def get_course_data_it(self):
+        return self.get_course_data("it")
+
+    def get_course_data_en(self):
+        return self.get_course_data("en")
+
+    def get_study_plans(self, lang="it"):
+        field = 'course_studyplans_json_en' if lang == "en" else 'course_studyplans_json_it'
+        self.load_deferred_fields(field)
+        return getattr(self, field)
+
     def save(self, *args, **kwargs):
         if self.payment_required and not self.payment_url:
             raise ValidationError(_("If payment is required you must specify a URL pointing to this"))
 
         old = None
         if self.pk:
-            old = Call.objects.get(pk=self.pk)
+            old = Call.objects.filter(pk=self.pk).only(
+                'course_cod', 'course_cohort', 'study_plan_cod', 'credits_reference_year'
+            ).first()
+
+        # read by the post_save receivers (credits summaries)
+        self._credits_reference_year_changed = bool(old) and old.credits_reference_year != self.credits_reference_year
 
         critical_data_changed = not old or (old.course_cod != self.course_cod or old.course_cohort != self.course_cohort)
 
-        if not self.course_json_it or critical_data_changed:
-            try:
-                data_it = requests.get(f"{STORAGE_API_CDS}?lang=it&cdscod={self.course_cod}&academicyear={self.course_cohort}&format=json", timeout=10000).json()['results'][0]
-                data_en = requests.get(f"{STORAGE_API_CDS}?lang=en&cdscod={self.course_cod}&academicyear={self.course_cohort}&format=json", timeout=10000).json()['results'][0]
-            except:
-                data_it = {}
-                data_en = {}
-            self.course_json_it = data_it
-            self.course_json_en = data_en
-
-        if not self.course_studyplans_json_it or critical_data_changed:
-            try:
-                plans_it = requests.get(f"{STORAGE_API_CDS_STUDYPLANS}{self.course_cod}/{self.course_cohort}?lang=it&format=json", timeout=10000).json()['results']
-                plans_en = requests.get(f"{STORAGE_API_CDS_STUDYPLANS}{self.course_cod}/{self.course_cohort}?lang=en&format=json", timeout=10000).json()['results']
-            except:
-                plans_it = {}
-                plans_en = {}
-            self.course_studyplans_json_it = plans_it
-            self.course_studyplans_json_en = plans_en
-        super().save(*args, **kwargs)
+        fetch_course = not self.course_json_it or critical_data_changed
+        fetch_plans = critical_data_changed or not self.get_study_plans()
+        data = {}
+        if fetch_course or fetch_plans:
+            data = fetch_course_data(
+                course_cod=self.course_cod,
+                course_cohort=self.course_cohort,
+                course=fetch_course,
+                studyplans=fetch_plans
+            )
+
+        # on failures previously stored data are kept, unless they
+        # belong to another course: they are cleared and fetched
+        # again on the next save
+        if data.get('course_it') is not None and data.get('course_en') is not None:
+            self.course_json_it = data['course_it']
+            self.course_json_en = data['course_en']
+        elif critical_data_changed:
+            self.course_json_it = None
+            self.course_json_en = None
+        self.department_cod = (self.course_json_it or {}).get('DepartmentCod', '') or ''
+
+        plans_changed = False
+        if data.get('studyplans_it') is not None and data.get('studyplans_en') is not None:
+            self.course_studyplans_json_it = data['studyplans_it']
+            self.course_studyplans_json_en = data['studyplans_en']
+            plans_changed = True
+        elif critical_data_changed:
+            self.course_studyplans_json_it = None
+            self.course_studyplans_json_en = None
+            plans_changed = True
+
+        # teachings are materialized for the selected plan tab only
+        study_plan_changed = not old or old.study_plan_cod != self.study_plan_cod
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if plans_changed or study_plan_changed:
+                self.rebuild_teachings()
+
+    def rebuild_teachings(self):
+        """
+        Materializes the study plans JSON in CallTeaching/CallTeachingModule
+        """
+        self.load_deferred_fields()
+        with transaction.atomic():
+            CallTeaching.objects.filter(call=self).delete()
+            for lang in ('it', 'en'):
+                materialize_teachings(
+                    call=self,
+                    lang=lang,
+                    plans=self.get_study_plans(lang),
+                    teaching_model=CallTeaching,
+                    module_model=CallTeachingModule
+                )
 
     @classmethod
     def get_active(cls):
@@ -101,48 +203,114 @@ class Call(ActivableModel, CreatedModifiedBy, TimeStampedModel):
             end__gt=timezone.localtime()
         )
 
+    @memoized
     def is_in_progress(self):
         return self.is_active and self.start<=timezone.localtime() and self.end>timezone.localtime()
 
     def get_requirements(self):
         return CallRequirement.objects.filter(call=self, is_active=True)
 
+    @memoized
+    def get_teachings_index(self, lang="it"):
+        """
+        {AfId/StudyActivityID: teaching data} of the study plan teachings
+        and modules, read from the materialized tables
+        """
+        index = {}
+        teachings = CallTeaching.objects.filter(
+            call=self,
+            lang=lang
+        ).annotate(
+            has_modules=models.Exists(
+                CallTeachingModule.objects.filter(teaching=models.OuterRef('pk'))
+            )
+        )
+        modules = CallTeachingModule.objects.filter(call=self, lang=lang)
+        for teaching in list(teachings) + list(modules):
+            index.setdefault(
+                teaching.activity_id,
+                {
+                    'name': teaching.name,
+                    'id': teaching.activity_id,
+                    'cod': teaching.cod,
+                    'credits': teaching.credits,
+                    'ssd': teaching.ssd,
+                    'year': teaching.year,
+                    'modules': getattr(teaching, 'has_modules', False)
+                }
+            )
+        return index
+
     def get_teaching_data(self, teaching_id, lang="it"):
-        data = self.course_studyplans_json_en if lang == "en" else self.course_studyplans_json_it
-        if not data: return {}
-        for plan in data[0]['PlanTabs']:
-            if plan['PlanTabCod'].upper() == self.study_plan_cod.upper():
-                for rule in plan['Rules']:
-                    for teaching in rule['Required']:
-                        if teaching['AfId'] == teaching_id:
-                            return {
-                                'name': teaching['AfDescription'],
-                                'id': teaching['AfId'],
-                                'cod': teaching['AfCod'],
-                                'credits': teaching['CreditValue'],
-                                'ssd': teaching['SettCod'],
-                                'year': rule['Year'],
-                                'modules': True if teaching['AfSubModules'] else False
-                            }
-                        for module in teaching['AfSubModules']:
-                            if module['StudyActivityID'] == teaching_id:
-                                return {
-                                    'name': module['StudyActivityName'],
-                                    'id': module['StudyActivityID'],
-                                    'cod': module['StudyActivityCod'],
-                                    'credits': module['StudyActivityCreditValue'],
-                                    'ssd': module['StudyActivitySettCod'],
-                                    'year': rule['Year'],
-                                    'modules': False
-                                }
-        return {}
+        # copy, the index is memoized on the instance
+        return dict(self.get_teachings_index(lang).get(teaching_id, {}))
 
+    def get_teachings(self, lang="it"):
+        return CallTeaching.objects.filter(
+            call=self,
+            lang=lang
+        ).prefetch_related('modules')
+
+    def get_teachings_it(self):
+        return self.get_teachings("it")
+
+    def get_teachings_en(self):
+        return self.get_teachings("en")
+
+    @memoized
     def can_show_commission_reviews(self):
-        if not self.commission: return False
+        if not hasattr(self, 'commission'): return False
         if not self.commission.is_active: return False
         return self.commission.show_results
 
 
+class CallTeaching(models.Model):
+    call = models.ForeignKey(Call, on_delete=models.CASCADE, related_name="teachings")
+    lang = models.CharField(max_length=2, default="it")
+    ordering = models.PositiveIntegerField(default=0)
+    activity_id = models.IntegerField(blank=True, null=True)
+    cod = models.CharField(max_length=255, blank=True, default='')
+    name = models.CharField(max_length=255, blank=True, default='')
+    credits = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True)
+    ssd = models.CharField(max_length=255, blank=True, default='')
+    year = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('call', 'lang', 'ordering')
+        indexes = [
+            models.Index(fields=['call', 'lang', 'activity_id']),
+            models.Index(fields=['call', 'lang', 'year']),
+            models.Index(fields=['call', 'cod']),
+        ]
+
+    def __str__(self):
+        return f'{self.cod} - {self.name}'
+
+
+class CallTeachingModule(models.Model):
+    call = models.ForeignKey(Call, on_delete=models.CASCADE, related_name="teaching_modules")
+    teaching = models.ForeignKey(CallTeaching, on_delete=models.CASCADE, related_name="modules")
+    lang = models.CharField(max_length=2, default="it")
+    ordering = models.PositiveIntegerField(default=0)
+    activity_id = models.IntegerField(blank=True, null=True)
+    cod = models.CharField(max_length=255, blank=True, default='')
+    name = models.CharField(max_length=255, blank=True, default='')
+    partition_cod = models.CharField(max_length=255, blank=True, default='')
+    credits = models.DecimalField(max_digits=4, decimal_places=1, blank=True, null=True)
+    ssd = models.CharField(max_length=255, blank=True, default='')
+    year = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ('teaching', 'ordering')
+        indexes = [
+            models.Index(fields=['call', 'lang', 'activity_id']),
+            models.Index(fields=['call', 'cod']),
+        ]
+
+    def __str__(self):
+        return f'{self.cod} - {self.name}'
+
+
 class CallExcludedActivity(ActivableModel, CreatedModifiedBy, TimeStampedModel):
     call = models.ForeignKey(Call, on_delete=models.CASCADE)
     code = models.CharField(max_length=10)
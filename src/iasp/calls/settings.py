@@ -1,3 +1,6 @@
+import os
+import tempfile
+
 from django.conf import settings
 
 
@@ -8,3 +11,14 @@ STORAGE_API_CDS = getattr(settings, 'STORAGE_API_CDS', 'https://storage.portale.
 
 # NEW GDA BASED
 STORAGE_API_CDS_STUDYPLANS = getattr(settings, 'STORAGE_API_CDS_STUDYPLANS', 'https://storage.portale.unical.it/api/ricerca/studyplans/')
+
+# storage API calls
+STORAGE_API_TIMEOUT = getattr(settings, 'STORAGE_API_TIMEOUT', 30) # in seconds
+# responses younger than this are served from the disk cache without any request,
+# older ones are revalidated with ETag/If-Modified-Since
+STORAGE_API_CACHE_TTL = getattr(settings, 'STORAGE_API_CACHE_TTL', 3600) # in seconds
+STORAGE_API_CACHE_PATH = getattr(
+    settings,
+    'STORAGE_API_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'iasp-storage-api')
+)
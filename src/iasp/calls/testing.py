@@ -0,0 +1,72 @@
+"""
+Storage API data shared by the tests of the apps working on calls.
+Patch calls.models.fetch_course_data with fake_fetch_course_data
+"""
+
+
+def teaching_data(af_id, cod, credits, modules=()):
+    return {
+        'AfId': af_id,
+        'AfDescription': f'Teaching {cod}',
+        'AfCod': cod,
+        'CreditValue': credits,
+        'SettCod': ['MAT/05'],
+        'AfSubModules': [
+            {
+                'StudyActivityID': module_id,
+                'StudyActivityName': f'Module {module_cod}',
+                'StudyActivityCod': module_cod,
+                'StudyActivityCreditValue': 3.0,
+                'StudyActivitySettCod': 'MAT/05'
+            }
+            for module_id, module_cod in modules
+        ]
+    }
+
+
+STUDY_PLANS = [{
+    'PlanTabs': [
+        {
+            'PlanTabCod': 'A',
+            'Rules': [
+                {'Year': 1, 'Required': [teaching_data(10, 'T10', 9.0), teaching_data(11, 'T11', 6.0)]},
+                {'Year': 2, 'Required': [teaching_data(20, 'T20', 12.0)]},
+                {'Year': 3, 'Required': [teaching_data(30, 'T30', 6.0)]}
+            ]
+        },
+        {
+            'PlanTabCod': 'B',
+            'Rules': [
+                {'Year': 1, 'Required': [teaching_data(1, 'B1', 6.0, modules=[(101, 'B11'), (102, 'B12')])]}
+            ]
+        },
+        {
+            'PlanTabCod': 'C',
+            'Rules': [
+                {'Year': 1, 'Required': [teaching_data(2, 'C1', 9.0)]},
+                {'Year': 2, 'Required': [teaching_data(3, 'C2', 12.0)]}
+            ]
+        }
+    ]
+}]
+
+COURSE = {'CdSName': 'Course', 'DepartmentCod': 'D1'}
+
+
+def fake_fetch_course_data(course_cod, course_cohort, course=True, studyplans=True, **kwargs):
+    data = {}
+    if course:
+        data['course_it'] = COURSE
+        data['course_en'] = COURSE
+    if studyplans:
+        data['studyplans_it'] = STUDY_PLANS
+        data['studyplans_en'] = STUDY_PLANS
+    return data
+
+
+def failed_fetch_course_data(course_cod, course_cohort, course=True, studyplans=True, **kwargs):
+    # storage API not available
+    return {
+        key: None
+        for key in fake_fetch_course_data(course_cod, course_cohort, course, studyplans)
+    }
@@ -1,3 +1,158 @@
+import copy
+import io
+
+from contextlib import redirect_stdout
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from . models import Call, CallTeaching, CallTeachingModule
+from . testing import STUDY_PLANS, failed_fetch_course_data, fake_fetch_course_data
+
+
+@mock.patch('calls.models.fetch_course_data', side_effect=fake_fetch_course_data)
+class CallTeachingsTest(TestCase):
+
+    def create_call(self, **kwargs):
+        data = {
+            'title_it': 'Bando',
+            'title_en': 'Call',
+            'course_cod': 'C1',
+            'course_cohort': 2024,
+            'study_plan_cod': 'B',
+            'credits_threshold': 10,
+            'credits_reference_year': 1,
+            'start': timezone.localtime() - timedelta(days=1),
+            'end': timezone.localtime() + timedelta(days=10),
+        }
+        data.update(kwargs)
+        call = Call(**data)
+        call.save()
+        return call
+
+    def test_materialize_teachings(self, fetch):
+        call = self.create_call()
+        teachings = CallTeaching.objects.filter(call=call, lang='it')
+        self.assertEqual([t.cod for t in teachings], ['B1'])
+        self.assertEqual(
+            list(CallTeachingModule.objects.filter(call=call, lang='it').values_list('cod', flat=True)),
+            ['B11', 'B12']
+        )
+        self.assertEqual(call.department_cod, 'D1')
+
+    def test_teaching_data(self, fetch):
+        call = Call.objects.get(pk=self.create_call().pk)
+        with self.assertNumQueries(2):
+            teaching = call.get_teaching_data(1)
+            module = call.get_teaching_data(101)
+            self.assertEqual(call.get_teaching_data(99), {})
+        self.assertEqual(
+            teaching,
+            {
+                'name': 'Teaching B1',
+                'id': 1,
+                'cod': 'B1',
+                'credits': Decimal('6.0'),
+                'ssd': 'MAT/05',
+                'year': 1,
+                'modules': True
+            }
+        )
+        self.assertEqual((module['cod'], module['credits'], module['modules']), ('B11', Decimal('3.0'), False))
+
+    def test_study_plan_change_rebuilds_teachings(self, fetch):
+        call = self.create_call()
+        fetch.reset_mock()
+
+        call.study_plan_cod = 'C'
+        call.save()
+
+        # study plans are not fetched again
+        self.assertFalse(fetch.called)
+        teachings = CallTeaching.objects.filter(call=call, lang='it')
+        self.assertEqual([t.cod for t in teachings], ['C1', 'C2'])
+        self.assertFalse(CallTeachingModule.objects.filter(call=call).exists())
+        self.assertEqual(call.get_teaching_data(3)['cod'], 'C2')
+
+    def test_unchanged_call_keeps_teachings(self, fetch):
+        call = self.create_call()
+        teaching_pks = list(CallTeaching.objects.filter(call=call).values_list('pk', flat=True))
+
+        call.title_it = 'Bando 2'
+        call.save()
+
+        self.assertEqual(
+            list(CallTeaching.objects.filter(call=call).values_list('pk', flat=True)),
+            teaching_pks
+        )
+
+    def test_failed_fetch_after_course_change(self, fetch):
+        call = self.create_call()
+
+        fetch.side_effect = failed_fetch_course_data
+        call.course_cod = 'C2'
+        call.save()
+
+        # previous course data are not kept
+        call = Call.objects.with_study_plans().get(pk=call.pk)
+        self.assertIsNone(call.course_json_it)
+        self.assertIsNone(call.course_studyplans_json_it)
+        self.assertEqual(call.department_cod, '')
+        self.assertFalse(CallTeaching.objects.filter(call=call).exists())
+
+        # fetched again on the next save
+        fetch.side_effect = fake_fetch_course_data
+        call.save()
+        self.assertEqual(call.department_cod, 'D1')
+        self.assertEqual(
+            list(CallTeaching.objects.filter(call=call, lang='it').values_list('cod', flat=True)),
+            ['B1']
+        )
+
+    def test_failed_fetch_keeps_data(self, fetch):
+        call = self.create_call()
+
+        Call.objects.filter(pk=call.pk).update(course_studyplans_json_it=None)
+        call = Call.objects.get(pk=call.pk)
+
+        fetch.reset_mock()
+        fetch.side_effect = failed_fetch_course_data
+        call.save()
+
+        self.assertTrue(fetch.called)
+        call = Call.objects.with_study_plans().get(pk=call.pk)
+        self.assertEqual(call.department_cod, 'D1')
+        self.assertIsNotNone(call.course_json_it)
+        self.assertTrue(CallTeaching.objects.filter(call=call).exists())
+
+    def test_refresh_study_plans(self, fetch):
+        call = self.create_call()
+
+        # english plan only changed
+        plans = copy.deepcopy(STUDY_PLANS)
+        tab = plans[0]['PlanTabs'][1]
+        tab['Rules'][0]['Required'][0]['CreditValue'] = 8.0
+        tab['Rules'][0]['Required'][0]['AfSubModules'].pop()
+        data = dict(fake_fetch_course_data(call.course_cod, call.course_cohort), studyplans_en=plans)
+
+        output = io.StringIO()
+        with mock.patch(
+            'calls.management.commands.refresh_study_plans.fetch_course_data',
+            return_value=data
+        ), redirect_stdout(output):
+            call_command('refresh_study_plans', workers=1)
 
-# Create your tests here.
+        self.assertIn('changed: course_studyplans_json_en', output.getvalue())
+        self.assertIn('[en] * B1 - Teaching B1 (6.0 -> 8.0 CFU)', output.getvalue())
+        self.assertIn('[en] - B12 - Module B12', output.getvalue())
+        self.assertNotIn('[it]', output.getvalue())
+        self.assertEqual(CallTeaching.objects.get(call=call, lang='en').credits, Decimal('8.0'))
+        self.assertEqual(CallTeaching.objects.get(call=call, lang='it').credits, Decimal('6.0'))
+        self.assertEqual(
+            list(CallTeachingModule.objects.filter(call=call, lang='en').values_list('cod', flat=True)),
+            ['B11']
+        )
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import os
+import requests
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from . settings import (
+    STORAGE_API_CACHE_PATH,
+    STORAGE_API_CACHE_TTL,
+    STORAGE_API_CDS,
+    STORAGE_API_CDS_STUDYPLANS,
+    STORAGE_API_TIMEOUT
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+_storage_api_session = None
+_storage_api_session_lock = threading.Lock()
+
+
+def build_teachings_index(plans, study_plan_cod):
+    """
+    Returns a dict {AfId/StudyActivityID: teaching data} built walking
+    the study plan only once. The first occurrence wins, as in the
+    original sequential lookup
+    """
+    index = {}
+    if not plans: return index
+    for plan in plans[0]['PlanTabs']:
+        if plan['PlanTabCod'].upper() != study_plan_cod.upper():
+            continue
+        for rule in plan['Rules']:
+            for teaching in rule['Required']:
+                index.setdefault(
+                    teaching['AfId'],
+                    {
+                        'name': teaching['AfDescription'],
+                        'id': teaching['AfId'],
+                        'cod': teaching['AfCod'],
+                        'credits': teaching['CreditValue'],
+                        'ssd': teaching['SettCod'],
+                        'year': rule['Year'],
+                        'modules': True if teaching['AfSubModules'] else False
+                    }
+                )
+                for module in teaching['AfSubModules']:
+                    index.setdefault(
+                        module['StudyActivityID'],
+                        {
+                            'name': module['StudyActivityName'],
+                            'id': module['StudyActivityID'],
+                            'cod': module['StudyActivityCod'],
+                            'credits': module['StudyActivityCreditValue'],
+                            'ssd': module['StudyActivitySettCod'],
+                            'year': rule['Year'],
+                            'modules': False
+                        }
+                    )
+    return index
+
+
+def _to_decimal(value):
+    if value is None or value == '': return None
+    return Decimal(str(value))
+
+
+def _join_ssd(value):
+    if isinstance(value, list): return ", ".join(value)
+    return value or ''
+
+
+def materialize_teachings(call, lang, plans, teaching_model, module_model):
+    """
+    Creates teaching and module rows for the call study plan.
+    Models are passed as arguments to be usable in data migrations too
+    """
+    if not plans: return
+
+    teachings = []
+    modules = {}
+    for plan in plans[0]['PlanTabs']:
+        if plan['PlanTabCod'].upper() != call.study_plan_cod.upper():
+            continue
+        for rule in plan['Rules']:
+            for teaching in rule['Required']:
+                ordering = len(teachings)
+                teachings.append(
+                    teaching_model(
+                        call_id=call.pk,
+                        lang=lang,
+                        ordering=ordering,
+                        activity_id=teaching['AfId'],
+                        cod=teaching['AfCod'] or '',
+                        name=teaching['AfDescription'] or '',
+                        credits=_to_decimal(teaching['CreditValue']),
+                        ssd=_join_ssd(teaching['SettCod']),
+                        year=rule['Year']
+                    )
+                )
+                modules[ordering] = [
+                    module_model(
+                        call_id=call.pk,
+                        lang=lang,
+                        ordering=module_ordering,
+                        activity_id=module['StudyActivityID'],
+                        cod=module['StudyActivityCod'] or '',
+                        name=module['StudyActivityName'] or '',
+                        partition_cod=module.get('studyActivityPartitionCod') or '',
+                        credits=_to_decimal(module['StudyActivityCreditValue']),
+                        ssd=module['StudyActivitySettCod'] or '',
+                        year=rule['Year']
+                    )
+                    for module_ordering, module in enumerate(teaching['AfSubModules'])
+                ]
+
+    teaching_model.objects.bulk_create(teachings)
+
+    # not all backends return pks from bulk_create
+    teaching_pks = dict(
+        teaching_model.objects.filter(
+            call_id=call.pk,
+            lang=lang
+        ).values_list('ordering', 'pk')
+    )
+    to_create = []
+    for ordering, teaching_modules in modules.items():
+        for module in teaching_modules:
+            module.teaching_id = teaching_pks[ordering]
+            to_create.append(module)
+    module_model.objects.bulk_create(to_create)
+
+
+def get_storage_api_session():
+    global _storage_api_session
+    with _storage_api_session_lock:
+        if _storage_api_session is None:
+            _storage_api_session = requests.Session()
+        return _storage_api_session
+
+
+def _cache_file_path(url):
+    return os.path.join(
+        STORAGE_API_CACHE_PATH,
+        f'{hashlib.sha256(url.encode()).hexdigest()}.json'
+    )
+
+
+def _read_cache(url):
+    try:
+        with open(_cache_file_path(url)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(url, cached):
+    os.makedirs(STORAGE_API_CACHE_PATH, exist_ok=True)
+    path = _cache_file_path(url)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+    with open(tmp_path, 'w') as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, path)
+
+
+def fetch_json(url, max_age=STORAGE_API_CACHE_TTL):
+    """
+    GET url through the shared session and the on-disk cache.
+    Fresh cached responses cost no request at all,
+    stale ones are revalidated with ETag/If-Modified-Since
+    """
+    cached = _read_cache(url)
+    if cached and time.time() - cached['fetched'] < max_age:
+        return cached['data']
+
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+
+    response = get_storage_api_session().get(
+        url,
+        headers=headers,
+        timeout=STORAGE_API_TIMEOUT
+    )
+    if response.status_code == 304 and cached:
+        cached['fetched'] = time.time()
+        _write_cache(url, cached)
+        return cached['data']
+
+    response.raise_for_status()
+    data = response.json()
+    _write_cache(
+        url,
+        {
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', ''),
+            'fetched': time.time(),
+            'data': data
+        }
+    )
+    return data
+
+
+def _fetch_course(course_cod, course_cohort, lang, max_age):
+    url = f"{STORAGE_API_CDS}?lang={lang}&cdscod={course_cod}&academicyear={course_cohort}&format=json"
+    return fetch_json(url, max_age)['results'][0]
+
+
+def _fetch_studyplans(course_cod, course_cohort, lang, max_age):
+    url = f"{STORAGE_API_CDS_STUDYPLANS}{course_cod}/{course_cohort}?lang={lang}&format=json"
+    return fetch_json(url, max_age)['results']
+
+
+def fetch_course_data(course_cod, course_cohort, course=True, studyplans=True, max_age=STORAGE_API_CACHE_TTL):
+    """
+    Fetches CdS and study plans JSON (it/en) concurrently.
+    Returns a dict with keys course_it, course_en, studyplans_it,
+    studyplans_en; failed fetches are None
+    """
+    jobs = {}
+    if course:
+        jobs['course_it'] = (_fetch_course, 'it')
+        jobs['course_en'] = (_fetch_course, 'en')
+    if studyplans:
+        jobs['studyplans_it'] = (_fetch_studyplans, 'it')
+        jobs['studyplans_en'] = (_fetch_studyplans, 'en')
+    if not jobs: return {}
+
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {
+            key: executor.submit(func, course_cod, course_cohort, lang, max_age)
+            for key, (func, lang) in jobs.items()
+        }
+
+    results = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            logger.warning(f"[{course_cod}/{course_cohort}] {key} fetch failed: {e}")
+            results[key] = None
+    return results
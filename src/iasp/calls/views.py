@@ -17,7 +17,7 @@ def calls(request):
 def call(request, pk):
     template = 'call.html'
     call = get_object_or_404(
-        Call,
+        Call.objects.with_course_data(),
         pk=pk
     )
     if not call.is_in_progress():
@@ -2,6 +2,9 @@ from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models.fields.files import FileField
+
+from . utils import get_file_info
 
 
 class ActivableModel(models.Model):
@@ -33,6 +36,78 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class MemoizedModel(models.Model):
+    """
+    Values cached by @memoized methods are dropped
+    when the instance is saved or reloaded
+    """
+
+    class Meta:
+        abstract = True
+
+    def clear_memo(self):
+        self.__dict__.pop('_memo', None)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.clear_memo()
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.clear_memo()
+
+
+class AttachmentsInfoModel(models.Model):
+    """
+    Content type, size, sha256 and pdf pages of the file fields,
+    {field name: info}, detected when a new file is uploaded
+    """
+    attachments_info = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def get_attachment_fields(self):
+        return [
+            field.name for field in self._meta.get_fields()
+            if isinstance(field, FileField)
+        ]
+
+    def update_attachments_info(self, fields=None):
+        for field_name in fields or self.get_attachment_fields():
+            value = getattr(self, field_name)
+            if not value:
+                self.attachments_info.pop(field_name, None)
+            # new upload, not yet saved on storage
+            elif not value._committed:
+                self.attachments_info[field_name] = get_file_info(value)
+
+    def get_attachment_info(self, field_name):
+        value = getattr(self, field_name)
+        if not value: return None
+        info = self.attachments_info.get(field_name)
+        if info: return info
+        # files uploaded before info was stored
+        with value.open('rb'):
+            info = get_file_info(value)
+        self.attachments_info[field_name] = info
+        type(self)._default_manager.filter(pk=self.pk).update(
+            attachments_info=self.attachments_info
+        )
+        return info
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_attachments_info()
+        else:
+            fields = [f for f in self.get_attachment_fields() if f in update_fields]
+            if fields:
+                self.update_attachments_info(fields)
+                kwargs['update_fields'] = {*update_fields, 'attachments_info'}
+        super().save(*args, **kwargs)
+
+
 class Log(models.Model):
     created_by = models.ForeignKey(get_user_model(), on_delete=models.PROTECT)
     created = models.DateTimeField(auto_now_add=True)
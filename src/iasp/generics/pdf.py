@@ -0,0 +1,293 @@
+import hashlib
+import os
+import pypdf
+import threading
+
+from collections import Counter
+from io import BytesIO
+
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template
+
+from pypdf.generic import (ArrayObject,
+                           DecodedStreamObject,
+                           DictionaryObject,
+                           EncodedStreamObject,
+                           IndirectObject,
+                           NameObject,
+                           NullObject,
+                           NumberObject,
+                           StreamObject)
+
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+
+from . settings import PDF_MERGE_BATCH_PAGES
+
+
+class PdfRenderer:
+    """
+    Renders templates to PDF reusing parsed stylesheets,
+    font configuration and templates between documents
+    """
+
+    def __init__(self, stylesheets=()):
+        self.font_config = FontConfiguration()
+        self.stylesheets = [
+            # real path on disk
+            CSS(filename=finders.find(stylesheet), font_config=self.font_config)
+            for stylesheet in stylesheets
+        ]
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def get_template(self, template_name):
+        template = self.templates.get(template_name)
+        if template is None:
+            template = get_template(template_name)
+            self.templates[template_name] = template
+        return template
+
+    def render(self, template_name, context, target=None):
+        """
+        Writes the PDF in target (path or file object),
+        returns its bytes if target is None
+        """
+        html = self.get_template(template_name).render(context)
+        # weasyprint objects are not thread safe
+        with self.lock:
+            return HTML(string=html).write_pdf(
+                target,
+                stylesheets=self.stylesheets,
+                font_config=self.font_config
+            )
+
+    def render_sections(self, template_name, context, target):
+        """
+        Writes the PDF in target and returns, for each anchor
+        (html id) in the document, the index of its first page
+        """
+        html = self.get_template(template_name).render(context)
+        with self.lock:
+            document = HTML(string=html).render(
+                stylesheets=self.stylesheets,
+                font_config=self.font_config
+            )
+            document.write_pdf(target)
+        pages = {}
+        for index, page in enumerate(document.pages):
+            for anchor in page.anchors:
+                pages.setdefault(anchor, index)
+        return pages
+
+
+_renderers = {}
+_renderers_lock = threading.Lock()
+
+
+def get_pdf_renderer(stylesheets=()):
+    """
+    Process-wide renderer for the given static stylesheets
+    """
+    key = tuple(stylesheets)
+    with _renderers_lock:
+        renderer = _renderers.get(key)
+        if renderer is None:
+            renderer = PdfRenderer(key)
+            _renderers[key] = renderer
+        return renderer
+
+
+class PdfMergeWriter:
+    """
+    Writes a PDF with pages copied from other PDFs.
+    Objects are written to the output file as soon as they are copied,
+    only their offsets are kept in memory. Identical streams without
+    references (fonts, images) shared between files are written once
+    and uncompressed streams are compressed
+    """
+    CATALOG = IndirectObject(1, 0, None)
+    PAGES = IndirectObject(2, 0, None)
+
+    def __init__(self, output):
+        self.output = output
+        # catalog and pages tree are written at the end
+        self.offsets = [0, 0]
+        self.kids = ArrayObject()
+        self.streams = {}
+        output.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    def _new_reference(self):
+        self.offsets.append(0)
+        return IndirectObject(len(self.offsets), 0, None)
+
+    def _write_object(self, reference, data):
+        self.offsets[reference.idnum - 1] = self.output.tell()
+        self.output.write(f'{reference.idnum} 0 obj\n'.encode())
+        self.output.write(data)
+        self.output.write(b'\nendobj\n')
+
+    def _serialize(self, obj):
+        buffer = BytesIO()
+        obj.write_to_stream(buffer)
+        return buffer.getvalue()
+
+    def _get_reference(self, indirect, references, pending):
+        key = (indirect.idnum, indirect.generation)
+        reference = references.get(key)
+        if reference is not None: return reference
+
+        obj = indirect.get_object()
+        if obj is None: return NullObject()
+        # pages are copied only when added, not through pages tree nodes
+        if isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Pages':
+            return self.PAGES
+        if isinstance(obj, StreamObject) and not _has_references(obj):
+            data = self._serialize(self._copy(obj, references, pending))
+            digest = hashlib.sha256(data).digest()
+            reference = self.streams.get(digest)
+            if reference is None:
+                reference = self._new_reference()
+                self._write_object(reference, data)
+                self.streams[digest] = reference
+        else:
+            reference = self._new_reference()
+            pending.append((reference, obj))
+        references[key] = reference
+        return reference
+
+    def _copy(self, obj, references, pending):
+        """
+        Copy of obj with references to output objects
+        """
+        if isinstance(obj, IndirectObject):
+            return self._get_reference(obj, references, pending)
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(self._copy(value, references, pending) for value in obj)
+        if not isinstance(obj, DictionaryObject):
+            return obj
+
+        copy = DecodedStreamObject() if isinstance(obj, StreamObject) else DictionaryObject()
+        is_page = isinstance(obj, pypdf.PageObject) or obj.get('/Type') == '/Page'
+        for key, value in obj.items():
+            if key == '/Parent' and is_page:
+                copy[NameObject(key)] = self.PAGES
+            else:
+                copy[NameObject(key)] = self._copy(value, references, pending)
+        if not isinstance(obj, StreamObject):
+            return copy
+        if '/Filter' in obj:
+            # encoded data copied as they are, pypdf has no public
+            # API for it (version pinned in requirements.txt)
+            stream = EncodedStreamObject()
+            stream.update(copy)
+            stream._data = obj._data
+            return stream
+        copy.set_data(obj.get_data())
+        return copy.flate_encode()
+
+    def add_pages(self, pages, references):
+        """
+        Appends pages. references maps objects of their document
+        already copied and must be kept between calls with pages
+        of the same document
+        """
+        pending = []
+        for page in pages:
+            # a new object even for pages already copied, a page
+            # can't appear twice in the pages tree
+            reference = self._new_reference()
+            key = (page.indirect_reference.idnum, page.indirect_reference.generation)
+            references.setdefault(key, reference)
+            # flattened page, with inherited attributes
+            pending.append((reference, page))
+            self.kids.append(reference)
+
+        while pending:
+            reference, obj = pending.pop()
+            self._write_object(reference, self._serialize(self._copy(obj, references, pending)))
+
+    def close(self):
+        """
+        Writes pages tree, catalog, cross-reference table and trailer
+        """
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): self.kids,
+            NameObject('/Count'): NumberObject(len(self.kids))
+        })
+        self._write_object(self.PAGES, self._serialize(pages))
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): self.PAGES
+        })
+        self._write_object(self.CATALOG, self._serialize(catalog))
+
+        xref = self.output.tell()
+        self.output.write(f'xref\n0 {len(self.offsets) + 1}\n'.encode())
+        self.output.write(b'0000000000 65535 f \n')
+        for offset in self.offsets:
+            self.output.write(f'{offset:010d} 00000 n \n'.encode())
+        trailer = DictionaryObject({
+            NameObject('/Size'): NumberObject(len(self.offsets) + 1),
+            NameObject('/Root'): self.CATALOG
+        })
+        self.output.write(b'trailer\n')
+        self.output.write(self._serialize(trailer))
+        self.output.write(f'\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+
+def _has_references(obj):
+    if isinstance(obj, IndirectObject):
+        return True
+    if isinstance(obj, DictionaryObject):
+        return any(_has_references(value) for value in obj.values())
+    if isinstance(obj, ArrayObject):
+        return any(_has_references(value) for value in obj)
+    return False
+
+
+def merge_pdf(sources, output_path, batch_pages=PDF_MERGE_BATCH_PAGES):
+    """
+    Merges sources, (path, pages range or None), in output_path.
+    Pages are copied in batches of batch_pages: copied objects are
+    already on disk, so each batch is read with a new reader and
+    objects parsed for the previous one are released. Each file is
+    closed as soon as its last pages are copied.
+    Returns (pages, size in bytes)
+    """
+    sources = [(str(path), pages_range) for path, pages_range in sources]
+    remaining = Counter(path for path, pages_range in sources)
+    files = {}
+    references = {}
+    tmp_path = f'{output_path}.{os.getpid()}'
+    try:
+        with open(tmp_path, 'wb') as output:
+            writer = PdfMergeWriter(output)
+            for path, pages_range in sources:
+                if path not in files:
+                    files[path] = open(path, 'rb')
+                    references[path] = {}
+                reader = pypdf.PdfReader(files[path])
+                indexes = range(len(reader.pages))
+                if pages_range:
+                    indexes = indexes[slice(*pages_range)]
+                for start in range(0, len(indexes), batch_pages):
+                    if start:
+                        reader = pypdf.PdfReader(files[path])
+                    writer.add_pages(
+                        [reader.pages[index] for index in indexes[start:start + batch_pages]],
+                        references[path]
+                    )
+                remaining[path] -= 1
+                if not remaining[path]:
+                    references.pop(path)
+                    files.pop(path).close()
+            writer.close()
+        os.replace(tmp_path, output_path)
+        return len(writer.kids), os.path.getsize(output_path)
+    finally:
+        for f in files.values():
+            f.close()
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
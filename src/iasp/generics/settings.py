@@ -18,3 +18,10 @@ PDF_FILETYPE = getattr(
 # 250MB - 214958080
 # 500MB - 429916160
 MAX_UPLOAD_SIZE = getattr(settings, "MAX_UPLOAD_SIZE", 10485760)
+
+# content-addressed files, relative to the storage location (MEDIA_ROOT)
+BLOB_STORAGE_PATH = getattr(settings, "BLOB_STORAGE_PATH", "blobs")
+
+# pages copied from a file before releasing its parsed objects
+# when merging PDFs
+PDF_MERGE_BATCH_PAGES = getattr(settings, "PDF_MERGE_BATCH_PAGES", 50)
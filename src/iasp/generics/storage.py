@@ -0,0 +1,79 @@
+import hashlib
+import os
+import shutil
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from . settings import BLOB_STORAGE_PATH
+
+
+def link_or_copy(source, destination):
+    """
+    Hard links destination to source, copies it
+    if links are not supported (e.g. different filesystems)
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+@deconstructible(path='generics.storage.BlobFileSystemStorage')
+class BlobFileSystemStorage(FileSystemStorage):
+    """
+    Content-addressed storage: each content is written once, in a blob
+    named by its sha256, and files with the same content are hard links
+    to it. The links count of a blob is its references count, blobs with
+    one link left are not referenced anymore (see gc_attachment_blobs)
+    """
+
+    def blob_path(self, sha256):
+        return os.path.join(
+            self.location,
+            BLOB_STORAGE_PATH,
+            sha256[:2],
+            sha256[2:4],
+            sha256
+        )
+
+    def content_sha256(self, content):
+        sha256 = hashlib.sha256()
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _link_blob(self, blob, name):
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        while True:
+            try:
+                os.link(blob, full_path)
+            except FileExistsError:
+                name = self.get_available_name(name)
+                full_path = self.path(name)
+            else:
+                break
+        name = os.path.relpath(full_path, self.location)
+        return str(name).replace("\\", "/")
+
+    def _save(self, name, content):
+        blob = self.blob_path(self.content_sha256(content))
+        if os.path.exists(blob):
+            try:
+                # known content, no data written
+                return self._link_blob(blob, name)
+            except OSError:
+                pass
+
+        name = super()._save(name, content)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(self.path(name), blob)
+        except OSError:
+            # same content saved concurrently or links not supported:
+            # the file is kept as a standalone copy
+            pass
+        return name
@@ -1,3 +1,90 @@
+import os
+import pypdf
+import tempfile
+
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
 from django.test import TestCase
 
-# Create your tests here.
+from . pdf import merge_pdf
+
+
+class MergePdfTest(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+
+    def make_pdf(self, name, labels, compress=False):
+        writer = pypdf.PdfWriter()
+        for label in labels:
+            page = writer.add_blank_page(200, 200)
+            page[NameObject('/Resources')] = DictionaryObject({
+                NameObject('/Font'): DictionaryObject({
+                    NameObject('/F1'): DictionaryObject({
+                        NameObject('/Type'): NameObject('/Font'),
+                        NameObject('/Subtype'): NameObject('/Type1'),
+                        NameObject('/BaseFont'): NameObject('/Helvetica')
+                    })
+                })
+            })
+            content = DecodedStreamObject()
+            content.set_data(f'BT /F1 12 Tf 10 10 Td ({label}) Tj ET'.encode())
+            page.replace_contents(content)
+            if compress:
+                page.compress_content_streams()
+        path = os.path.join(self.folder.name, name)
+        writer.write(path)
+        return path
+
+    def test_merge_in_batches(self):
+        first = self.make_pdf('first.pdf', [f'a{i}' for i in range(7)])
+        second = self.make_pdf('second.pdf', [f'b{i}' for i in range(5)])
+        output_path = os.path.join(self.folder.name, 'merged.pdf')
+
+        pages, size = merge_pdf(
+            [(first, None), (second, (1, 4)), (first, (5, None))],
+            output_path,
+            batch_pages=2
+        )
+
+        reader = pypdf.PdfReader(output_path, strict=True)
+        self.assertEqual(pages, 12)
+        self.assertEqual(size, os.path.getsize(output_path))
+        self.assertEqual(
+            [page.extract_text() for page in reader.pages],
+            ['a0', 'a1', 'a2', 'a3', 'a4', 'a5', 'a6', 'b1', 'b2', 'b3', 'a5', 'a6']
+        )
+        self.assertEqual(sorted(os.listdir(self.folder.name)), ['first.pdf', 'merged.pdf', 'second.pdf'])
+
+    def test_merged_file_is_readable(self):
+        # flate encoded streams are copied as they are
+        first = self.make_pdf('first.pdf', ['a0', 'a1'], compress=True)
+        second = self.make_pdf('second.pdf', ['b0'])
+        output_path = os.path.join(self.folder.name, 'merged.pdf')
+
+        pages, size = merge_pdf([(first, None), (second, None), (first, (1, None))], output_path)
+
+        sources = [pypdf.PdfReader(first).pages[0], pypdf.PdfReader(first).pages[1]]
+        self.assertEqual(sources[0]['/Contents'].get_object()['/Filter'], '/FlateDecode')
+        sources += [pypdf.PdfReader(second).pages[0], sources[1]]
+        reader = pypdf.PdfReader(output_path, strict=True)
+        self.assertEqual(len(reader.pages), pages)
+        self.assertEqual(len(reader.pages), 4)
+        for page, source in zip(reader.pages, sources):
+            self.assertEqual(page.get_contents().get_data(), source.get_contents().get_data())
+            self.assertEqual(page.mediabox, source.mediabox)
+            self.assertEqual(page['/Resources']['/Font']['/F1']['/BaseFont'], '/Helvetica')
+        self.assertEqual([page.extract_text() for page in reader.pages], ['a0', 'a1', 'b0', 'a1'])
+        self.assertEqual(reader.pages[0]['/Contents'].get_object()['/Filter'], '/FlateDecode')
+
+    def test_temporary_file_removed_on_errors(self):
+        first = self.make_pdf('first.pdf', ['a0'])
+        output_path = os.path.join(self.folder.name, 'merged.pdf')
+
+        with self.assertRaises(FileNotFoundError):
+            merge_pdf(
+                [(first, None), (os.path.join(self.folder.name, 'missing.pdf'), None)],
+                output_path
+            )
+        self.assertEqual(sorted(os.listdir(self.folder.name)), ['first.pdf'])
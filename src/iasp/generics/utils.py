@@ -0,0 +1,73 @@
+import functools
+import hashlib
+import logging
+import magic
+import pypdf
+
+
+logger = logging.getLogger(__name__)
+
+
+def memoized(method):
+    """
+    Caches the method result on the instance, per arguments.
+    Model instances live for one request, so does the cache
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        memo = self.__dict__.setdefault('_memo', {})
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in memo:
+            memo[key] = method(self, *args, **kwargs)
+        return memo[key]
+    return wrapper
+
+
+class RequestObjects:
+    """
+    Objects loaded by view decorators,
+    shared between them for the request lifetime
+    """
+    def __init__(self):
+        self.commission = None
+        self.call = None
+        self.application = None
+        self.excluded_codes = None
+
+
+def get_request_objects(request):
+    objects = getattr(request, '_request_objects', None)
+    if objects is None:
+        objects = RequestObjects()
+        request._request_objects = objects
+    return objects
+
+
+def get_file_info(f):
+    """
+    Content type, size, sha256 and pdf pages of a file.
+    Detected once, on upload, and stored to avoid sniffing on downloads
+    """
+    sha256 = hashlib.sha256()
+    head = b''
+    size = 0
+    for chunk in f.chunks():
+        if len(head) < 2048: head += chunk[:2048 - len(head)]
+        sha256.update(chunk)
+        size += len(chunk)
+    content_type = magic.from_buffer(head, mime=True)
+
+    pages = None
+    if content_type == 'application/pdf':
+        try:
+            f.seek(0)
+            pages = len(pypdf.PdfReader(f).pages)
+        except Exception as e:
+            logger.warning(f"{f.name}: pdf pages count failed: {e}")
+    f.seek(0)
+    return {
+        'content_type': content_type,
+        'size': size,
+        'sha256': sha256.hexdigest(),
+        'pages': pages
+    }
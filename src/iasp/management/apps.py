@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'management'
+
+    def ready(self):
+        from . import signals
+        from . roles import check_roles_cache
+        check_roles_cache()
@@ -5,18 +5,30 @@ from django.utils.translation import gettext_lazy as _
 
 from applications.models import Application
 
+from calls.models import CALL_DEFERRED_FIELDS
+
+from generics.utils import get_request_objects
+
 from . models import CallCommission
+from . roles import get_user_roles
 
 
 def application_check(func_to_decorate):
     def new_func(*original_args, **original_kwargs):
         request = original_args[0]
-        application = get_object_or_404(
-            Application,
-            call__pk=original_kwargs['call_pk'],
-            pk=original_kwargs['application_pk'],
-            submission_date__isnull=False
-        )
+        objects = get_request_objects(request)
+        application = objects.application
+        if not application or application.pk != original_kwargs['application_pk']:
+            application = get_object_or_404(
+                Application.objects.select_related('user'),
+                call__pk=original_kwargs['call_pk'],
+                pk=original_kwargs['application_pk'],
+                submission_date__isnull=False
+            )
+            # call already loaded by commission/structure decorators
+            if objects.call and objects.call.pk == application.call_id:
+                application.call = objects.call
+            objects.application = application
         original_kwargs['application'] = application
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -25,10 +37,18 @@ def application_check(func_to_decorate):
 def belongs_to_a_commission(func_to_decorate):
     def new_func(*original_args, **original_kwargs):
         request = original_args[0]
+        commission_ids = get_user_roles(request.user)['commissions'].values()
+        if not commission_ids:
+            messages.add_message(
+                request,
+                messages.ERROR,
+                _('Access denied')
+            )
+            return redirect('generics:home')
+
         commissions = CallCommission.objects.filter(
-            is_active=True,
-            callcommissionmember__user=request.user,
-            callcommissionmember__is_active=True
+            pk__in=commission_ids,
+            is_active=True
         ).annotate(
             applications_count=Count(
                 "call__applications",
@@ -36,14 +56,6 @@ def belongs_to_a_commission(func_to_decorate):
             )
         )
 
-        if not commissions.exists():
-            messages.add_message(
-                request,
-                messages.ERROR,
-                _('Access denied')
-            )
-            return redirect('generics:home')
-
         original_kwargs['commissions'] = commissions
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -54,13 +66,16 @@ def belongs_to_commission(func_to_decorate):
     def new_func(*original_args, **original_kwargs):
         request = original_args[0]
         call_pk = original_kwargs['call_pk']
-        commission = CallCommission.objects.filter(
-            call__pk=call_pk,
-            call__is_active=True,
-            is_active=True,
-            callcommissionmember__user=request.user,
-            callcommissionmember__is_active=True
-        ).select_related('call').first()
+        commission_id = get_user_roles(request.user)['commissions'].get(call_pk)
+        commission = None
+        if commission_id:
+            commission = CallCommission.objects.filter(
+                pk=commission_id,
+                call__is_active=True,
+                is_active=True
+            ).select_related('call').defer(
+                *[f'call__{field}' for field in CALL_DEFERRED_FIELDS]
+            ).first()
 
         if not commission or not commission.is_in_progress():
             messages.add_message(
@@ -70,6 +85,9 @@ def belongs_to_commission(func_to_decorate):
             )
             return redirect('generics:home')
 
+        objects = get_request_objects(request)
+        objects.commission = commission
+        objects.call = commission.call
         original_kwargs['commission'] = commission
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -0,0 +1,95 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+from organizational_area.models import (OrganizationalStructure,
+                                        OrganizationalStructureOfficeEmployee)
+
+from . models import CallCommissionMember
+from . settings import (ROLES_CACHE_ALIAS,
+                        ROLES_CACHE_TIMEOUT,
+                        VIEW_APPLICATIONS_OFFICE)
+
+
+# bump when snapshot format changes
+ROLES_SNAPSHOT_VERSION = 1
+
+
+def _roles_cache_key(user_id):
+    return f'iasp-roles-snapshot-{ROLES_SNAPSHOT_VERSION}-{user_id}'
+
+
+def get_roles_cache():
+    return caches[ROLES_CACHE_ALIAS or DEFAULT_CACHE_ALIAS]
+
+
+def check_roles_cache():
+    """
+    Fails if the roles cache alias is not shared between processes
+    """
+    if not ROLES_CACHE_ALIAS: return
+    if isinstance(get_roles_cache(), LocMemCache):
+        raise ImproperlyConfigured(
+            f"ROLES_CACHE_ALIAS '{ROLES_CACHE_ALIAS}' must be a cache "
+            "shared between processes, not a local-memory one"
+        )
+
+
+def _build_user_roles(user):
+    structures = dict(
+        OrganizationalStructureOfficeEmployee.objects.filter(
+            employee=user,
+            office__is_active=True,
+            office__name=VIEW_APPLICATIONS_OFFICE,
+            office__organizational_structure__is_active=True
+        ).values_list(
+            'office__organizational_structure_id',
+            'office__organizational_structure__unique_code'
+        )
+    )
+    operator_structures = list(
+        OrganizationalStructure.objects.filter(
+            is_active=True,
+            organizationalstructureoffice__is_active=True,
+            organizationalstructureoffice__organizationalstructureofficeemployee__employee=user
+        ).values('name', 'unique_code').distinct()
+    )
+    commissions = dict(
+        CallCommissionMember.objects.filter(
+            user=user,
+            is_active=True,
+            commission__is_active=True
+        ).values_list('commission__call_id', 'commission_id')
+    )
+    return {
+        # {structure pk: unique_code}, with VIEW_APPLICATIONS_OFFICE
+        'structures': structures,
+        # [{name, unique_code}], any active office
+        'operator_structures': operator_structures,
+        # {call pk: commission pk}
+        'commissions': commissions
+    }
+
+
+def get_user_roles(user):
+    """
+    Snapshot of user roles, from cache
+    """
+    if not user.is_authenticated:
+        return {'structures': {}, 'operator_structures': [], 'commissions': {}}
+    # once per request
+    if '_roles' in user.__dict__:
+        return user.__dict__['_roles']
+
+    cache = get_roles_cache()
+    key = _roles_cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = _build_user_roles(user)
+        cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+    user.__dict__['_roles'] = roles
+    return roles
+
+
+def invalidate_user_roles(user_ids):
+    get_roles_cache().delete_many([_roles_cache_key(user_id) for user_id in user_ids])
@@ -3,3 +3,10 @@ from django.conf import settings
 
 APPLICATIONS_PAGINATION = getattr(settings, 'APPLICATIONS_PAGINATION', 50)
 VIEW_APPLICATIONS_OFFICE = getattr(settings, 'VIEW_APPLICATIONS_OFFICE', 'view')
+# cache alias for user roles snapshots. Invalidation signals only reach
+# the cache of the process where they run, so it must be shared between
+# workers (Redis, database...): local-memory caches are refused.
+# If not set, the default cache is used with a short timeout
+ROLES_CACHE_ALIAS = getattr(settings, 'ROLES_CACHE_ALIAS', None)
+# seconds
+ROLES_CACHE_TIMEOUT = getattr(settings, 'ROLES_CACHE_TIMEOUT', 3600 if ROLES_CACHE_ALIAS else 30)
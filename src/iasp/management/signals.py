@@ -0,0 +1,61 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from applications.models import update_insertion_credits_summary
+
+from organizational_area.models import (OrganizationalStructure,
+                                        OrganizationalStructureOffice,
+                                        OrganizationalStructureOfficeEmployee)
+
+from . models import *
+from . roles import invalidate_user_roles
+
+
+@receiver(post_save, sender=ApplicationInsertionRequiredCommissionReview)
+@receiver(post_delete, sender=ApplicationInsertionRequiredCommissionReview)
+@receiver(post_save, sender=ApplicationInsertionFreeCommissionReview)
+@receiver(post_delete, sender=ApplicationInsertionFreeCommissionReview)
+def review_changed(sender, instance, **kwargs):
+    update_insertion_credits_summary(instance.insertion)
+
+
+@receiver(post_save, sender=CallCommissionMember)
+@receiver(post_delete, sender=CallCommissionMember)
+def commission_member_changed(sender, instance, **kwargs):
+    invalidate_user_roles([instance.user_id])
+
+
+@receiver(post_save, sender=CallCommission)
+@receiver(post_delete, sender=CallCommission)
+def commission_changed(sender, instance, **kwargs):
+    invalidate_user_roles(
+        CallCommissionMember.objects.filter(
+            commission_id=instance.pk
+        ).values_list('user_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=OrganizationalStructureOfficeEmployee)
+@receiver(post_delete, sender=OrganizationalStructureOfficeEmployee)
+def office_employee_changed(sender, instance, **kwargs):
+    invalidate_user_roles([instance.employee_id])
+
+
+@receiver(post_save, sender=OrganizationalStructureOffice)
+@receiver(post_delete, sender=OrganizationalStructureOffice)
+def office_changed(sender, instance, **kwargs):
+    invalidate_user_roles(
+        OrganizationalStructureOfficeEmployee.objects.filter(
+            office_id=instance.pk
+        ).values_list('employee_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=OrganizationalStructure)
+@receiver(post_delete, sender=OrganizationalStructure)
+def structure_changed(sender, instance, **kwargs):
+    invalidate_user_roles(
+        OrganizationalStructureOfficeEmployee.objects.filter(
+            office__organizational_structure_id=instance.pk
+        ).values_list('employee_id', flat=True)
+    )
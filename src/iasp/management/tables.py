@@ -17,11 +17,13 @@ class ApplicationTable(tables.Table):
     submission_date = tables.Column(verbose_name=_("Submission date"))
     protocol_number = tables.Column(verbose_name=_("Registration number"))
     protocol_date = tables.Column(verbose_name=_("Registration date"))
+    # annotated by Application.objects.with_credits_status()
+    tot_credits = tables.Column(verbose_name=_("Credits"))
 
     class Meta:
         model = Application
         template_name = "django_tables2/bootstrap5-responsive.html"
-        fields = ("user", "submission_date", "protocol_number", "protocol_date")
+        fields = ("user", "submission_date", "protocol_number", "protocol_date", "tot_credits")
         attrs = {"class": "table table-bordered table-striped table-hover"}
 
 
@@ -1,6 +1,7 @@
 from django import template
 
 from .. models import *
+from .. roles import get_user_roles
 
 
 register = template.Library()
@@ -8,8 +9,4 @@ register = template.Library()
 
 @register.simple_tag
 def is_commission_member(user):
-    return CallCommissionMember.objects.filter(
-        user=user,
-        is_active=True,
-        commission__is_active=True
-    ).exists()
+    return bool(get_user_roles(user)['commissions'])
@@ -1,3 +1,129 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from calls.models import Call
+
+from organizational_area.models import (OrganizationalStructure,
+                                        OrganizationalStructureOffice,
+                                        OrganizationalStructureOfficeEmployee)
+
+from . models import CallCommission, CallCommissionMember
+from . roles import check_roles_cache, get_user_roles
+from . settings import VIEW_APPLICATIONS_OFFICE
+
+
+@mock.patch('calls.models.fetch_course_data', return_value={})
+class UserRolesTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(
+            username='member',
+            taxpayer_id='MEMBER'
+        )
+        self.structure = OrganizationalStructure.objects.create(
+            name='Department',
+            slug='department',
+            unique_code='D1'
+        )
+        self.office = OrganizationalStructureOffice.objects.create(
+            name=VIEW_APPLICATIONS_OFFICE,
+            slug=VIEW_APPLICATIONS_OFFICE,
+            organizational_structure=self.structure,
+            is_active=True
+        )
+
+    def get_roles(self):
+        # a new user instance, roles are stored on it for the request
+        return get_user_roles(get_user_model().objects.get(pk=self.user.pk))
+
+    def create_commission(self):
+        call = Call.objects.create(
+            title_it='Bando',
+            title_en='Call',
+            course_cod='C1',
+            course_cohort=2024,
+            credits_threshold=10,
+            credits_reference_year=1,
+            study_plan_cod='A',
+            start=timezone.localtime() - timedelta(days=1),
+            end=timezone.localtime() + timedelta(days=10)
+        )
+        return CallCommission.objects.create(
+            call=call,
+            name='Commission',
+            start=call.start,
+            end=call.end
+        )
+
+    def test_commission_membership_invalidates_roles(self, fetch):
+        commission = self.create_commission()
+        self.assertEqual(self.get_roles()['commissions'], {})
+
+        member = CallCommissionMember.objects.create(commission=commission, user=self.user)
+        self.assertEqual(self.get_roles()['commissions'], {commission.call_id: commission.pk})
+
+        commission.is_active = False
+        commission.save()
+        self.assertEqual(self.get_roles()['commissions'], {})
+
+        commission.is_active = True
+        commission.save()
+        member.delete()
+        self.assertEqual(self.get_roles()['commissions'], {})
+
+    def test_office_membership_invalidates_roles(self, fetch):
+        self.assertEqual(self.get_roles()['structures'], {})
+
+        employee = OrganizationalStructureOfficeEmployee.objects.create(
+            employee=self.user,
+            office=self.office
+        )
+        roles = self.get_roles()
+        self.assertEqual(roles['structures'], {self.structure.pk: 'D1'})
+        self.assertEqual(
+            roles['operator_structures'],
+            [{'name': 'Department', 'unique_code': 'D1'}]
+        )
+
+        self.office.is_active = False
+        self.office.save()
+        roles = self.get_roles()
+        self.assertEqual(roles['structures'], {})
+        self.assertEqual(roles['operator_structures'], [])
+
+        self.office.is_active = True
+        self.office.save()
+        employee.delete()
+        self.assertEqual(self.get_roles()['structures'], {})
+
+    def test_roles_are_cached(self, fetch):
+        self.get_roles()
+        with self.assertNumQueries(1):
+            # user only
+            self.get_roles()
+
+
+class RolesCacheTest(TestCase):
+
+    @override_settings(CACHES={
+        'roles': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    })
+    @mock.patch('management.roles.ROLES_CACHE_ALIAS', 'roles')
+    def test_local_memory_cache_is_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            check_roles_cache()
+
+    @override_settings(CACHES={
+        'roles': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'roles_cache'
+        }
+    })
+    @mock.patch('management.roles.ROLES_CACHE_ALIAS', 'roles')
+    def test_shared_cache_is_accepted(self):
+        check_roles_cache()
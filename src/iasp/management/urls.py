@@ -12,6 +12,7 @@ urlpatterns = [
     path(f'{prefix}/commissions/', commissions.list, name='commissions'),
     path(f'{prefix}/commissions/call/<int:call_pk>/', commissions.detail, name='commission'),
     path(f'{prefix}/commissions/call/<int:call_pk>/applications/', commissions.applications, name='commission_applications'),
+    path(f'{prefix}/commissions/call/<int:call_pk>/attachments/', commissions.export_attachments, name='commission_attachments_export'),
     path(f'{prefix}/commissions/call/<int:call_pk>/applications/<int:application_pk>/', commissions.application, name='commission_application'),
     path(f'{prefix}/commissions/call/<int:call_pk>/applications/<int:application_pk>/export/', commissions.export, name='commission_application_export'),
 
@@ -34,6 +35,7 @@ urlpatterns = [
     path(f'{prefix}/<str:structure_code>/', structures.calls, name='calls'),
     path(f'{prefix}/<str:structure_code>/call/<int:call_pk>/', structures.call, name='call'),
     path(f'{prefix}/<str:structure_code>/call/<int:call_pk>/applications/', structures.applications, name='applications'),
+    path(f'{prefix}/<str:structure_code>/call/<int:call_pk>/attachments/', structures.export_attachments, name='attachments_export'),
     path(f'{prefix}/<str:structure_code>/call/<int:call_pk>/applications/<int:application_pk>/', structures.application, name='application'),
     path(f'{prefix}/<str:structure_code>/call/<int:call_pk>/applications/<int:application_pk>/export/', structures.export, name='application_export'),
 
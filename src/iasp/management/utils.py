@@ -6,7 +6,7 @@ from django.conf import settings
 from django.http import HttpResponse
 
 from applications.models import *
-from calls.models import CallFreeCreditsRule
+from calls.models import CallFreeCreditsRule, CallTeachingModule
 
 from openpyxl import Workbook
 from openpyxl.styles import Font
@@ -15,15 +15,20 @@ from openpyxl.styles import Font
 logger = logging.getLogger(__name__)
 
 
-def find_father_teaching(plan_rules, teaching_id):
-    for rule in plan_rules:
-        for teaching in rule['Required']:
-            for module in teaching['AfSubModules']:
-                if module['StudyActivityID'] == teaching_id:
-                    return f"{teaching['AfCod']} - {teaching['AfDescription']}"
-    return ''
+def find_father_teachings(call, lang="it"):
+    modules = CallTeachingModule.objects.filter(
+        call=call,
+        lang=lang
+    ).select_related('teaching')
+    father_teachings = {}
+    for module in modules:
+        father_teachings.setdefault(
+            module.activity_id,
+            f"{module.teaching.cod} - {module.teaching.name}"
+        )
+    return father_teachings
+
 
-                            
 def export_xls(application):
     # Crea un nuovo file Excel
     wb = Workbook()
@@ -47,8 +52,8 @@ def export_xls(application):
     ).prefetch_related('review').order_by('target_teaching_name')
 
     if insertions_required.exists():
-        plan_rules = application.call.course_studyplans_json_it[0]['PlanTabs'][0]['Rules']
-        
+        father_teachings = find_father_teachings(application.call)
+
         ws.append([])
 
         ws.append(["Insegnamenti previsti dal piano"])
@@ -88,10 +93,7 @@ def export_xls(application):
             ws.cell(row=ws.max_row, column=col).font = Font(bold=True)
 
         for required in insertions_required:
-            father_teaching_info = find_father_teaching(
-                plan_rules,
-                required.target_teaching_id
-            )
+            father_teaching_info = father_teachings.get(required.target_teaching_id, '')
 
             data = [
                 f"{required.source_teaching_name} ({required.source_teaching_ssd or '-'})",
@@ -80,7 +80,7 @@ def applications(request, call_pk, commission=None):
     applications = Application.objects.filter(
         call=commission.call,
         submission_date__isnull=False
-    )
+    ).select_related('user').with_credits_status(show_commission_review=True)
     f = ApplicationFilter(request.GET, queryset=applications)
     table = CommissionApplicationTable(f.qs)
     RequestConfig(request, paginate={"per_page": APPLICATIONS_PAGINATION}).configure(table)
@@ -141,6 +141,7 @@ def application_required_list(request, call_pk, application_pk, commission=None,
 
     application_data = get_application_required_insertions_data(
         application=application,
+        codes_to_exclude=get_excluded_codes(request, application.call),
         show_commission_review=True
     )
 
@@ -232,7 +233,6 @@ def application_free(request, call_pk, application_pk, year, commission=None, ap
 @login_required
 @belongs_to_commission
 @application_check
-@application_check
 def application_free_detail(request, call_pk, application_pk, year, insertion_pk, commission=None, application=None):
     free_credits_rule = get_object_or_404(
         CallFreeCreditsRule,
@@ -627,7 +627,6 @@ def application_required_review_logs(request, call_pk, application_pk, teaching_
 @login_required
 @belongs_to_commission
 @application_check
-@application_check
 def application_free_review_logs(request, call_pk, application_pk, year, insertion_pk, commission=None, application=None):
     free_credits_rule = get_object_or_404(
         CallFreeCreditsRule,
@@ -665,3 +664,10 @@ def application_free_review_logs(request, call_pk, application_pk, year, inserti
 @application_check
 def export(request, call_pk, application_pk, commission=None, application=None):
     return export_xls(application)
+
+
+@login_required
+@belongs_to_commission
+def export_attachments(request, call_pk, commission=None):
+    if not has_permission_to_download_call(request.user, commission.call): raise Http404
+    return call_attachments_response(commission.call)
@@ -44,19 +44,15 @@ logger = logging.getLogger(__name__)
 @is_structure_operator
 def calls(request, structure_code, structure=None):
     template = 'structures/calls.html'
-    calls = Call.objects.filter(
+    structure_calls = Call.objects.filter(
         is_active=True,
-        course_json_it__isnull=False
+        department_cod=structure_code
     ).annotate(
         applications_count=Count(
             "applications",
             filter=Q(applications__submission_date__isnull=False)
         )
     )
-    structure_calls = []
-    for call in calls:
-        if call.course_json_it.get('DepartmentCod', '') == structure_code:
-            structure_calls.append(call)
 
     return render(
         request,
@@ -88,10 +84,11 @@ def call(request, structure_code, call_pk, structure=None, call=None):
 @can_manage_call
 def applications(request, structure_code, call_pk, structure=None, call=None):
     template = 'structures/applications.html'
+    show_commission_review = call.can_show_commission_reviews()
     applications = Application.objects.filter(
         call=call,
         submission_date__isnull=False
-    )
+    ).select_related('user').with_credits_status(show_commission_review)
     f = ApplicationFilter(request.GET, queryset=applications)
     table = ApplicationTable(f.qs)
     RequestConfig(request, paginate={"per_page": APPLICATIONS_PAGINATION}).configure(table)
@@ -115,11 +112,7 @@ def applications(request, structure_code, call_pk, structure=None, call=None):
 def application(request, structure_code, call_pk, application_pk, structure=None, call=None, application=None):
     template = 'structures/application.html'
 
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     tot_credits = application.get_credits_status(show_commission_review)
 
@@ -160,14 +153,11 @@ def application(request, structure_code, call_pk, application_pk, structure=None
 def application_required_list(request, structure_code, call_pk, application_pk, structure=None, call=None, application=None):
     template = 'structures/application_required_list.html'
 
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     application_data = get_application_required_insertions_data(
         application=application,
+        codes_to_exclude=get_excluded_codes(request, application.call),
         show_commission_review=show_commission_review
     )
 
@@ -243,11 +233,7 @@ def application_required_detail(request, structure_code, call_pk, application_pk
 @can_manage_call
 @application_check
 def application_free(request, structure_code, call_pk, application_pk, year, structure=None, call=None, application=None):
-    show_commission_review = CallCommission.objects.filter(
-        call=application.call,
-        is_active=True,
-        show_results=True
-    ).exists()
+    show_commission_review = application.call.can_show_commission_reviews()
 
     data = get_application_free_insertions_data(
         application=application,
@@ -313,3 +299,11 @@ def application_free_detail(request, structure_code, call_pk, application_pk, ye
 @application_check
 def export(request, structure_code, call_pk, application_pk, structure=None, call=None, application=None):
     return export_xls(application)
+
+
+@login_required
+@is_structure_operator
+@can_manage_call
+def export_attachments(request, structure_code, call_pk, structure=None, call=None):
+    if not has_permission_to_download_call(request.user, call): raise Http404
+    return call_attachments_response(call)
@@ -3,10 +3,11 @@ from django.shortcuts import get_object_or_404
 
 from calls.models import Call
 
-from management.settings import VIEW_APPLICATIONS_OFFICE
+from generics.utils import get_request_objects
 
-from . models import (OrganizationalStructure,
-                      OrganizationalStructureOfficeEmployee)
+from management.roles import get_user_roles
+
+from . models import OrganizationalStructure
 
 
 def is_operator(func_to_decorate):
@@ -14,11 +15,7 @@ def is_operator(func_to_decorate):
         request = original_args[0]
         if request.user.is_superuser:
             return func_to_decorate(*original_args, **original_kwargs)
-        my_offices = OrganizationalStructureOfficeEmployee.objects\
-                                                          .filter(employee=request.user,
-                                                                  office__is_active=True,
-                                                                  office__organizational_structure__is_active=True)
-        if not my_offices.exists():
+        if not get_user_roles(request.user)['operator_structures']:
             raise PermissionDenied
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -36,13 +33,7 @@ def is_structure_operator(func_to_decorate):
         original_kwargs['structure'] = structure
         if request.user.is_superuser:
             return func_to_decorate(*original_args, **original_kwargs)
-        my_offices = OrganizationalStructureOfficeEmployee.objects\
-                                                          .filter(employee=request.user,
-                                                                  office__is_active=True,
-                                                                  office__name=VIEW_APPLICATIONS_OFFICE,
-                                                                  office__organizational_structure_id=structure.pk)\
-                                                          .values_list('office__name', flat=True)
-        if not my_offices.exists():
+        if structure.pk not in get_user_roles(request.user)['structures']:
             raise PermissionDenied
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -56,11 +47,11 @@ def can_manage_call(func_to_decorate):
         call = get_object_or_404(
             Call,
             is_active=True,
-            pk=original_kwargs['call_pk'],
-            course_json_it__isnull=False,
+            pk=original_kwargs['call_pk']
         )
-        if not call.course_json_it.get('DepartmentCod', '') == original_kwargs['structure_code']:
+        if not call.department_cod == original_kwargs['structure_code']:
             raise PermissionDenied
+        get_request_objects(request).call = call
         original_kwargs['call'] = call
         return func_to_decorate(*original_args, **original_kwargs)
     return new_func
@@ -1,6 +1,8 @@
 from django import template
 from django.db.models import Q
 
+from management.roles import get_user_roles
+
 from organizational_area.models import *
 
 
@@ -13,17 +15,7 @@ def is_operator(user):
         return []
     if user.is_superuser:
         return OrganizationalStructure.objects.filter(is_active=True).values('name', 'unique_code')
-    user_offices = OrganizationalStructureOfficeEmployee.objects\
-        .filter(employee=user,
-                office__is_active=True,
-                office__organizational_structure__is_active=True)
-    if not user_offices.exists():
-        return []
-    structures = []
-    for office in user_offices:
-        if not office.office.organizational_structure in structures:
-            structures.append(office.office.organizational_structure)
-    return structures
+    return get_user_roles(user)['operator_structures']
 
 
 @register.simple_tag
@@ -1,6 +1,12 @@
-import pypdf
+import logging
+
+from django.conf import settings
 
 from applications.models import *
+from generics.pdf import merge_pdf
+
+
+logger = logging.getLogger(__name__)
 
 
 def merge_attachments_pdf(application=None):
@@ -11,22 +17,15 @@ def merge_attachments_pdf(application=None):
 
     pdfFiles = []
     for r in required:
-        pdfFiles.append(r.source_teaching_attachment.path)
+        pdfFiles.append((r.source_teaching_attachment.path, None))
     for f in free:
-        pdfFiles.append(f.source_teaching_attachment.path)
+        pdfFiles.append((f.source_teaching_attachment.path, None))
 
     try:
-        pdfWriter = pypdf.PdfWriter()
-
-        for filename in pdfFiles:
-            pdfFileObj = open(filename, 'rb')
-            pdfReader = pypdf.PdfReader(pdfFileObj)
-            for pageNum in range(len(pdfReader.pages)):
-                pageObj = pdfReader.pages[pageNum]
-                pdfWriter.add_page(pageObj)
-
-        pdfOutput = open(f'{settings.MEDIA_ROOT}/allegati/bando-{application.call.pk}/domanda-{application.user.taxpayer_id}/allegati.pdf', 'wb')
-        pdfWriter.write(pdfOutput)
-        pdfOutput.close()
-    except:
+        return merge_pdf(
+            pdfFiles,
+            f'{settings.MEDIA_ROOT}/allegati/bando-{application.call.pk}/domanda-{application.user.taxpayer_id}/allegati.pdf'
+        )
+    except Exception as e:
+        logger.exception(e)
         return